@@ -1,10 +1,34 @@
 import os
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, Response, stream_with_context
+from werkzeug.local import LocalProxy
+from contextlib import ExitStack, nullcontext
 from openai import OpenAI
-import pyodbc
-import re
+import json
+import time
+import queue
 import datetime
+import threading
+import atexit
+import functools
+import contextvars
+from session_store import Session, create_session_store, new_session_id
+from conversation_memory import ConversationMemory
+from chat_history import ChatHistory, HistoryError
+from db_pool import PoolTimeout, DatabaseUnavailable, DB_ERRORS, create_pool
+from food_catalog import FoodCatalog
+from daily_tally import DailyTally
+from response_cache import ResponseCache
+from intents import router, parse_exercise, parse_food_qty, MEALS
+import bulk_import
+import assets
+import metrics
+import trends
+import write_behind
+from write_behind import WriteBehindJournal
+from plan_scheduler import PlanScheduler
+from warmup import Warmup
+from llm_governor import LLMGovernor, LLMUnavailable
 
 app = Flask(__name__, static_folder='static', static_url_path='/static')
 
@@ -12,108 +36,526 @@ app = Flask(__name__, static_folder='static', static_url_path='/static')
 load_dotenv()
 XAI_API_KEY = os.getenv("XAI_API_KEY")
 if not XAI_API_KEY:
-    raise ValueError("Missing XAI_API_KEY in .env file!")
-client = OpenAI(api_key=XAI_API_KEY, base_url="https://api.x.ai/v1")
-
-# Database connection
-def connect_to_db():
-    conn_str = (
-        "DRIVER={ODBC Driver 13 for SQL Server};"
-        "SERVER=ZER0-TW0;"
-        "DATABASE=MonikaTracker;"
-        "Trusted_Connection=yes;"
-    )
-    try:
-        conn = pyodbc.connect(conn_str)
+    print("LLM ERROR: Missing XAI_API_KEY in .env file! /readyz stays down until it's set")
+LLM_MODEL = "grok-2-latest"
+
+# Built on first use (or by the warm-up thread), not at import
+@functools.lru_cache(maxsize=None)
+def get_client():
+    if not XAI_API_KEY:
+        raise ValueError("Missing XAI_API_KEY in .env file!")
+    # The governor owns deadlines and failover, so the client's own retries are kept short
+    return OpenAI(api_key=XAI_API_KEY, base_url=os.getenv("XAI_BASE_URL", "https://api.x.ai/v1"),
+                  max_retries=int(os.getenv("LLM_MAX_RETRIES", "1")))
+
+# Every completion goes through the governor: at most LLM_MAX_IN_FLIGHT calls to the provider,
+# a deadline per call, a hedged duplicate for calls stuck past the recent p95, a circuit breaker,
+# then LLM_FALLBACK_MODEL, then a canned reply (see ask_monika)
+llm_governor = LLMGovernor(
+    lambda **kwargs: get_client().chat.completions.create(**kwargs),
+    LLM_MODEL,
+    fallback_model=os.getenv("LLM_FALLBACK_MODEL") or None,
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "5")),
+    deadline=float(os.getenv("LLM_DEADLINE", "20")),
+    fallback_deadline=float(os.getenv("LLM_FALLBACK_DEADLINE", "8")),
+    hedge=os.getenv("LLM_HEDGE", "1") == "1",
+    hedge_min=float(os.getenv("LLM_HEDGE_MIN", "0.5")),
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+    reset_after=float(os.getenv("LLM_BREAKER_RESET", "30")),
+)
+
+# Request timing: every request gets a root span; DB statements, LLM calls and handlers nest under
+# it. Requests slower than SLOW_REQUEST_MS (0 = off) are logged with their span tree.
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+@app.before_request
+def start_timing():
+    g.request_span = metrics.start_request(f"{request.method} {request.path}")
+
+@app.after_request
+def record_status(response):
+    g.response_status = response.status_code
+    return response
+
+# Flask runs teardown for a stream_with_context response twice: when the view returns, and again
+# when the stream finishes. Hooks that must cover the whole stream skip the first one.
+def streaming():
+    return g.get("stream_open", False)
+
+@app.teardown_request
+def finish_timing(exc):
+    if streaming():
+        return
+    root, token = g.pop("request_span", (None, None))
+    if root is None:
+        return
+    status = g.pop("response_status", 500 if exc is not None else 200)
+    duration = metrics.finish_request(root, token, request.endpoint or "unknown", request.method, status)
+    if SLOW_REQUEST_MS and duration * 1000 >= SLOW_REQUEST_MS:
+        print("SLOW REQUEST:\n" + "\n".join(root.tree(1)))
+
+def traced_handler(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        step = session_state["setup_step"]
+        with metrics.span("handler", fn.__name__, step=step) as span:
+            result = fn(*args, **kwargs)
+            span.attrs["next_step"] = session_state["setup_step"]
+        metrics.STEP_TRANSITIONS.inc(1, fn.__name__, step, span.attrs["next_step"])
+        return result
+    return wrapper
+
+# Database connection (SQL Server, or the local SQLite stand-in with DB_BACKEND=sqlite)
+DB_UNAVAILABLE = DB_ERRORS + (PoolTimeout, DatabaseUnavailable)
+pool = create_pool()
+
+# Nothing connects at import: the warm-up thread opens the pool and primes the caches below in the
+# background, re-probing the DB every READY_CHECK_INTERVAL seconds. Until the DB is up, requests
+# fail fast with DatabaseUnavailable instead of waiting out the pool's reconnect backoff.
+warmup = Warmup(recheck_interval=float(os.getenv("READY_CHECK_INTERVAL", "10")))
+
+def probe_db():
+    with pool.connection() as conn:
         cursor = conn.cursor()
-        print("DB: Connected successfully!")
-        return conn, cursor
-    except pyodbc.Error as e:
-        print(f"DB ERROR: Connection failed - {e}")
-        return None, None
-
-conn, cursor = connect_to_db()
-if not conn:
-    raise ConnectionError("Database connection failed")
-
-# Session state
-session_state = {
-    "messages": [],
-    "setup_step": 0,
-    "setup_data": {"ActivityLevel": "SomewhatActive"},
-    "setup_prompts": [],
-    "daily_prompts": [],
-    "mode": "fitness",  # Default mode
-    "daily_plan": None,
-    "meals_logged_today": [],
-    "state": {"progress": 0.5, "trend_data": {}, "happy": False, "sad": False, "typing": False},
-    "waiting_for_input": False,
-    "conn": conn,
-    "cursor": cursor
-}
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+
+# Each request checks out its own connection on first use and returns it at teardown
+def get_conn():
+    if "db_conn" not in g:
+        if not warmup.ready("db"):
+            raise DatabaseUnavailable("Database is not connected yet")
+        g.db_conn = pool.checkout()
+    return g.db_conn
+
+def get_cursor():
+    if "db_cursor" not in g:
+        g.db_cursor = metrics.InstrumentedCursor(get_conn().cursor())
+    return g.db_cursor
+
+# Active foods, cached in memory; anything that changes FoodItems must call food_catalog.invalidate()
+food_catalog = FoodCatalog(get_cursor, max_age=int(os.getenv("FOOD_CATALOG_MAX_AGE", "3600")), errors=DB_UNAVAILABLE)
+
+# Weight and calorie trends for /trends and the mood bar, read incrementally from the log tables on
+# a background thread; requests only read the last report
+trend_engine = trends.TrendEngine(pool, max_age=int(os.getenv("TRENDS_MAX_AGE", "60")))
+trend_engine.start()
+
+# Today's exercise/meal counts, maintained in memory by submit_exercise and log_actual
+daily_tally = DailyTally(pool, reconcile_interval=int(os.getenv("TALLY_RECONCILE_SECONDS", "300")))
+daily_tally.start()
+
+def warm_food_catalog():
+    with app.app_context():
+        exc = None
+        try:
+            food_catalog.names()
+        except Exception as e:
+            exc = e
+            raise
+        finally:
+            release_db(exc)
+
+warmup.add("llm", get_client)
+warmup.add("db", pool.warm, probe=probe_db)
+warmup.add("food_catalog", warm_food_catalog, required=False)
+warmup.add("daily_tally", lambda: daily_tally.seeded or daily_tally.reconcile(), required=False)
+warmup.add("trends", lambda: trend_engine.report is not None or trend_engine.refresh(), required=False)
+warmup.add("templates", lambda: app.jinja_env.get_template("index.html"), required=False)
+warmup.start()
+
+# Optional write-behind mode: exercise/meal/weight/deviation logs are appended to a local journal and applied
+# to the DB in batches by a background writer, instead of on the request path
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+journal = None
+if WRITE_BEHIND:
+    journal = WriteBehindJournal(
+        pool,
+        os.getenv("WRITE_BEHIND_JOURNAL", "monika-journal.jsonl"),
+        batch_size=int(os.getenv("WRITE_BEHIND_BATCH", "100")),
+        flush_interval=float(os.getenv("WRITE_BEHIND_INTERVAL", "0.5")),
+    )
+    # Replayed writes aren't in the DB yet, so the tally wouldn't see them when it seeds
+    for entry in journal.pending():
+        if entry["kind"] == "exercise":
+            daily_tally.record_exercise(entry["date"])
+        elif entry["kind"] == "meal":
+            daily_tally.record_meal(entry["date"], entry["meal"])
+    journal.start()
+    atexit.register(journal.flush, 5)
+
+# The request's connection is checked out before the writer is held off, the same order the
+# writer takes them in
+def journal_frozen():
+    if journal is None:
+        return nullcontext()
+    get_cursor()
+    return journal.frozen()
+
+# A journaled walk has no burn until it's applied, so it's counted at SubmitExercise's estimate
+def pending_calories(kind, day):
+    if journal is None:
+        return 0
+    day = day.isoformat()
+    calories = write_behind.estimated_burn if kind == "exercise" else lambda e: e["calories"] or 0
+    return sum(calories(e) for e in journal.pending(kind) if e["date"] == day)
+
+# Commits the request's connection, if it checked one out (write-behind turns often don't), then
+# runs what was waiting on the writes it carried
+def commit_db():
+    if "db_conn" in g:
+        g.db_conn.commit()
+    for fn, args in g.pop("after_commit", []):
+        fn(*args)
+
+# Work that depends on a write on the request's connection (counting it in the tally, re-reading
+# trends) only runs once commit_db() succeeds, so a write that's rolled back never inflates the
+# tally; journaled writes are durable as soon as they're appended
+def after_commit(fn, *args):
+    if "db_conn" in g:
+        g.setdefault("after_commit", []).append((fn, args))
+    else:
+        fn(*args)
+
+@app.teardown_request
+def release_db(exc):
+    g.pop("db_cursor", None)
+    broken = g.pop("db_broken", False) or isinstance(exc, DB_ERRORS)
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        pool.release(conn, broken=broken)
+
+# Session state: one Session per browser, looked up by cookie for the duration of a request
+SESSION_COOKIE = "monika_sid"
+sessions = create_session_store()
+session_state = LocalProxy(lambda: g.session)
+
+SESSIONLESS_ENDPOINTS = {"static", "built_asset", "stats", "metrics_endpoint", "import_history", "healthz", "readyz"}
+
+# Every message is also written to a local history store. The session keeps only the newest
+# SESSION_MESSAGES of them, / renders the newest INDEX_MESSAGES, and /history pages back from there.
+chat_history = ChatHistory(
+    os.getenv("CHAT_HISTORY_PATH", "monika-chat.db"),
+    batch_size=int(os.getenv("CHAT_HISTORY_BATCH", "200")),
+    flush_interval=float(os.getenv("CHAT_HISTORY_INTERVAL", "0.5")),
+)
+chat_history.start()
+atexit.register(chat_history.flush)
+SESSION_MESSAGES = int(os.getenv("SESSION_MESSAGES", "200"))
+INDEX_MESSAGES = int(os.getenv("INDEX_MESSAGES", "50"))
+
+@app.before_request
+def load_session():
+    if request.endpoint in SESSIONLESS_ENDPOINTS:
+        return
+    sid = request.cookies.get(SESSION_COOKIE)
+    g.new_session = not sid
+    g.sid = sid or new_session_id()
+    g.session_scope = ExitStack()
+    g.session_scope.enter_context(sessions.lock(g.sid))
+    g.session = sessions.get(g.sid)
+    # A known cookie with an empty session means the store lost it (a restart, or idle expiry)
+    if not g.new_session and g.session.next_message_id == 1:
+        try:
+            chat_history.restore(g.session, SESSION_MESSAGES)
+        except HistoryError as e:
+            print(f"HISTORY ERROR: couldn't restore {g.sid[:8]} - {e}")
+
+@app.after_request
+def set_session_cookie(response):
+    if g.get("new_session"):
+        response.set_cookie(SESSION_COOKIE, g.sid, max_age=sessions.idle_timeout, httponly=True, samesite="Lax")
+    return response
+
+@app.teardown_request
+def save_session(exc):
+    if streaming():
+        return
+    scope = g.pop("session_scope", None)
+    if scope is None:
+        return
+    with scope:
+        if exc is None:
+            sessions.save(g.sid, g.session)
+
+# Replies to templated prompts are reused across users (see ask_monika's cache flag)
+response_cache = ResponseCache(
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    max_keys=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    variants=int(os.getenv("RESPONSE_CACHE_VARIANTS", "3")),
+    sample=float(os.getenv("RESPONSE_CACHE_SAMPLE", "0.25")),
+)
+
+# Streaming: while /send/stream is running a message, g.event_sink collects events for the client
+def emit(event, data):
+    sink = g.get("event_sink")
+    if sink is not None:
+        sink.put((event, data))
 
 def add_message(sender, message):
     role = "monika" if sender == "Monika" else "user"
+    msg = session_state.append_message(role, f"{sender}: {message}")
+    chat_history.append(session_state.sid, msg)
+    messages = session_state["messages"]
+    if len(messages) > SESSION_MESSAGES:
+        del messages[:len(messages) - SESSION_MESSAGES]
+    emit("message", msg)
+
+# Delta protocol: clients send the id of the last message they have as "since" and get back only
+# newer messages plus the new cursor. A missing or unknown cursor gets the full list with reset set.
+def requested_cursor():
+    try:
+        return int(request.values["since"])
+    except (KeyError, ValueError):
+        return None
+
+# Progress toward the goal drives the mood bar; without a goal or weigh-ins it keeps its default
+def update_mood():
+    report = trend_engine.report
+    if report is not None:
+        mood = trends.mood(report)
+        if mood["progress"] is None:
+            del mood["progress"]
+        session_state["state"].update(mood)
+    return report
+
+def message_delta(since):
+    update_mood()
+    last_id = session_state.last_message_id
+    reset = since is None or since > last_id
+    messages = session_state["messages"] if reset else session_state.messages_since(since)
+    return {"messages": messages, "cursor": last_id, "reset": reset, "state": session_state["state"]}
+
+# Fixed per mode and sent first, so the provider's prompt cache can reuse the prefix; everything
+# that changes from call to call (memory, context, foods) comes after it
+SYSTEM_PROMPTS = {
+    "fitness": (
+        "You are Monika, Joseph’s sassy, supportive fitness Waifu, guiding him through his carnivore diet fitness journey with a realistic, human-like tone. "
+        "Diet is carnivore—only the active foods listed in the context. No veggies, fruits, or carbs—stick to meat-based suggestions. "
+        "Day 1: InitializeAppSetup/CompleteAppSetup, StartWeight = CurrentWeight. Daily: DailyStartupCheck, CalculateBaselineCalories, CalculateDailyDeficit, GenerateDailyPlan. "
+        "Provide running tally of exercises and meals, allow ongoing updates."
+    ),
+    "chat": (
+        "You are Monika, Joseph’s playful, flirty chatbot girlfriend with a sassy, human-like tone. "
+        "Chat freely, be supportive and fun, only mention fitness if he brings it up."
+    ),
+}
+LLM_TOKEN_LOG = os.getenv("LLM_TOKEN_LOG", "0") == "1"
+# Said instead of a reply to the user's own words when no model answers
+CHAT_FALLBACK = "Sorry, babe, my head's a little foggy right now. Give me a moment and say that again?"
+
+SUMMARY_PROMPT = (
+    "You keep Monika's memory of her conversation with Joseph. Update the summary with the new turns: keep facts about "
+    "Joseph, his goals, preferences, progress, promises and anything he'd expect her to remember; drop small talk. "
+    "Reply with the summary only, under 150 words."
+)
+
+def summarize_conversation(summary, turns):
+    messages = [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Summary so far: {summary or 'Nothing yet.'}\n\nNew turns:\n" + "\n".join(turns)},
+    ]
+    # No canned fallback: a failed summary is just retried on a later window
+    with metrics.span("llm", LLM_MODEL, purpose="summary"):
+        reply, usage, model = llm_governor.complete(messages)
+    if usage is not None:
+        metrics.LLM_TOKENS.inc(usage.prompt_tokens, model, "summary_prompt")
+        metrics.LLM_TOKENS.inc(usage.completion_tokens, model, "summary_completion")
+    return reply.strip()
+
+# Recent turns under a token budget, with older ones folded into a rolling summary in the background
+conversation_memory = ConversationMemory(
+    sessions,
+    summarize_conversation,
+    budget=int(os.getenv("MEMORY_TOKEN_BUDGET", "1500")),
+    summarize_after=int(os.getenv("MEMORY_SUMMARIZE_AFTER", "300")),
+)
+conversation_memory.start()
+
+def build_messages(mode, prompt, context, foods, remember):
+    messages = [{"role": "system", "content": SYSTEM_PROMPTS[mode]}]
+    history, history_tokens = [], 0
+    if remember:
+        summary, history, history_tokens = conversation_memory.window(g.session, skip_last_user=True)
+        if summary:
+            messages.append({"role": "system", "content": f"What you remember from earlier with Joseph: {summary}"})
+        messages.extend(history)
+    messages.append({"role": "system", "content": f"Context: {context}." + (f" Active foods: {foods}." if foods else "")})
+    messages.append({"role": "user", "content": prompt})
+    return messages, len(history), history_tokens
+
+# Pass cache=False for prompts that carry live numbers (tallies, plans, the user's own words).
+# Only those get the conversation history: cached replies are shared across users.
+# fallback is what Monika says when no model answers in time. By default it's the prompt itself,
+# since the templated prompts are already written in her voice; callers passing the user's own
+# words give a canned line instead, and fallback=False raises LLMUnavailable.
+def ask_monika(prompt, context="", cache=True, fallback=None):
+    mode = "fitness" if session_state["mode"] == "fitness" else "chat"
+    foods = ""
+    if mode == "fitness":
+        foods = ", ".join(food_catalog.names()) or "meat only (carnivore diet)"
+    cache_key = response_cache.key(session_state["mode"], prompt, context, foods) if cache else None
+    cached = response_cache.get(cache_key) if cache else None
+    if cached is not None:
+        emit("token", {"text": cached})
+        return cached
+    messages, turns, history_tokens = build_messages(mode, prompt, context, foods, remember=not cache)
+    if fallback is None:
+        fallback = prompt
+    # Attempts run on the governor's threads, so tokens go straight to this request's sink
+    sink = g.get("event_sink")
+    on_token = (lambda token: sink.put(("token", {"text": token}))) if sink is not None else None
     session_state["state"]["typing"] = True
-    session_state["messages"].append({"role": role, "content": f"{sender}: {message}"})
-    session_state["state"]["typing"] = False
-
-def ask_monika(prompt, context=""):
-    cursor = session_state["cursor"]
-    cursor.execute("SELECT FoodName FROM FoodItems WHERE Active = 1")
-    foods = ", ".join([row[0] for row in cursor.fetchall()]) or "meat only (carnivore diet)"
-    if session_state["mode"] == "fitness":
-        system_prompt = (
-            "You are Monika, Joseph’s sassy, supportive fitness Waifu, guiding him through his carnivore diet fitness journey with a realistic, human-like tone. "
-            f"Context: {context}. Diet is carnivore—only active foods: {foods}. No veggies, fruits, or carbs—stick to meat-based suggestions. "
-            "Day 1: InitializeAppSetup/CompleteAppSetup, StartWeight = CurrentWeight. Daily: DailyStartupCheck, CalculateBaselineCalories, CalculateDailyDeficit, GenerateDailyPlan. "
-            "Provide running tally of exercises and meals, allow ongoing updates."
-        )
-    else:  # Chat mode
-        system_prompt = (
-            "You are Monika, Joseph’s playful, flirty chatbot girlfriend with a sassy, human-like tone. "
-            f"Context: {context}. Chat freely, be supportive and fun, only mention fitness if he brings it up."
-        )
-    response = client.chat.completions.create(
-        model="grok-2-latest",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    return response.choices[0].message.content
+    emit("typing", True)
+    try:
+        with metrics.span("llm", LLM_MODEL, stream=sink is not None, history=turns) as span:
+            reply, usage, model = llm_governor.complete(messages, stream=sink is not None, on_token=on_token,
+                                                        fallback=fallback or None)
+            span.attrs.update(model=model or "canned")
+            if usage is not None:
+                cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+                span.attrs.update(prompt_tokens=usage.prompt_tokens, cached_tokens=cached_tokens,
+                                  completion_tokens=usage.completion_tokens)
+                metrics.LLM_TOKENS.inc(usage.prompt_tokens, model, "prompt")
+                metrics.LLM_TOKENS.inc(cached_tokens, model, "cached_prompt")
+                metrics.LLM_TOKENS.inc(usage.completion_tokens, model, "completion")
+                metrics.LLM_PROMPT_TOKENS.observe(usage.prompt_tokens, model, mode)
+                if LLM_TOKEN_LOG:
+                    print(f"LLM TOKENS: {mode} prompt={usage.prompt_tokens} cached={cached_tokens} "
+                          f"completion={usage.completion_tokens} history={turns} turns/~{history_tokens} tokens")
+        # A canned reply isn't cached, so the next user gets a real one
+        if cache and reply and model is not None:
+            response_cache.put(cache_key, reply)
+        return reply
+    finally:
+        session_state["state"]["typing"] = False
+        emit("typing", False)
 
-def get_db_context():
-    cursor = session_state["cursor"]
-    cursor.execute("SELECT TOP 5 ExerciseType, DurationMinutes, CalorieBurn, date FROM Exercise WHERE ExerciseTypeID IN (SELECT LookupID FROM LookupValues WHERE GroupName = 'ExerciseTypes') ORDER BY date DESC")
+# Workouts, goal and last progress in one round trip (three result sets from one batch)
+CONTEXT_BATCH = (
+    "SELECT TOP 5 ExerciseType, DurationMinutes, CalorieBurn, date FROM Exercise WHERE ExerciseTypeID IN (SELECT LookupID FROM LookupValues WHERE GroupName = 'ExerciseTypes') ORDER BY date DESC; "
+    "SELECT GoalDescription, StartWeight, TargetWeight, TargetDate FROM Goals WHERE GoalType = 'LongTerm' AND Active = 1; "
+    "SELECT TOP 1 Laps, CaloriesBurned, Weight FROM ProgressLog ORDER BY LogTimestamp DESC"
+)
+CONTEXT_MAX_AGE = int(os.getenv("CONTEXT_MAX_AGE", "300"))
+
+def fetch_context_snapshot():
+    cursor = get_cursor()
+    cursor.execute(CONTEXT_BATCH)
     workouts = [f"{row[0]}: {row[1]} min, {row[2]} cal on {row[3]}" for row in cursor.fetchall()]
-    cursor.execute("SELECT GoalDescription, StartWeight, TargetWeight, TargetDate FROM Goals WHERE GoalType = 'LongTerm' AND Active = 1")
+    cursor.nextset()
     goal = cursor.fetchone()
-    goals = f"{goal[0]}, Start: {goal[1]} lbs, Target: {goal[2]} lbs by {goal[3]}" if goal else "Not set"
-    cursor.execute("SELECT FoodName FROM FoodItems WHERE Active = 1")
-    foods = ", ".join([row[0] for row in cursor.fetchall()]) or "None set"
-    cursor.execute("SELECT TOP 1 Laps, CaloriesBurned, Weight FROM ProgressLog ORDER BY LogTimestamp DESC")
+    cursor.nextset()
     progress = cursor.fetchone()
-    progress_str = f"Laps: {progress[0]}, Burn: {progress[1]} cal, Weight: {progress[2]} lbs" if progress else "No progress logged"
+    return {
+        "workouts": ", ".join(workouts) if workouts else "None yet",
+        "goal": f"{goal[0]}, Start: {goal[1]} lbs, Target: {goal[2]} lbs by {goal[3]}" if goal else "Not set",
+        "progress": f"Laps: {progress[0]}, Burn: {progress[1]} cal, Weight: {progress[2]} lbs" if progress else "No progress logged",
+        "fetched_at": time.time(),
+    }
+
+# The snapshot is memoized per session; the write paths call invalidate_context(), which also
+# tells the trend engine there are new rows once they're committed (journaled writes show up on
+# its next periodic refresh after they're applied)
+def invalidate_context():
+    session_state["db_context"] = None
+    after_commit(trend_engine.notify)
+
+# Journaled exercise the writer hasn't applied yet, laid over the DB snapshot
+def pending_context(snapshot):
+    workouts, progress_str = snapshot["workouts"], snapshot["progress"]
+    pending = journal.pending("exercise") if journal is not None else []
+    if pending:
+        recent = [f"{e['type']}: {e['minutes']} min, {write_behind.estimated_burn(e)} cal on {e['date']}" for e in reversed(pending)]
+        if workouts != "None yet":
+            recent.append(workouts)
+        workouts = ", ".join(recent)
+        last = pending[-1]
+        progress_str = f"Laps: {last['laps']}, Burn: {write_behind.estimated_burn(last)} cal, Weight: {last['weight']} lbs"
+    return workouts, progress_str
+
+def get_db_context():
+    # The snapshot and the pending writes laid over it are read with the writer held off, so a batch
+    # applied in between can't drop out of both
+    with journal_frozen():
+        snapshot = session_state["db_context"]
+        applied = journal.applied_seq if journal is not None else 0
+        if snapshot is None or time.time() - snapshot["fetched_at"] > CONTEXT_MAX_AGE or snapshot.get("applied_seq", 0) < applied:
+            snapshot = session_state["db_context"] = dict(fetch_context_snapshot(), applied_seq=applied)
+        workouts, progress_str = pending_context(snapshot)
+    goals = snapshot["goal"]
+    foods = ", ".join(food_catalog.names()) or "None set"
     plan = session_state["daily_plan"]
     plan_str = f"Today’s Plan: {plan['text']}" if plan else "No plan yet"
     logged = session_state["meals_logged_today"]
     logged_str = f"Logged Today: {', '.join(logged) if logged else 'None'}"
     setup_data = session_state["setup_data"]
     setup_str = f"Setup: {', '.join([f'{k}: {v}' for k, v in setup_data.items()])}"
-    return f"Workouts: {', '.join(workouts) if workouts else 'None yet'}. Goal: {goals}. Foods: {foods}. Last Progress: {progress_str}. {plan_str}. {logged_str}. {setup_str}."
+    return f"Workouts: {workouts}. Goal: {goals}. Foods: {foods}. Last Progress: {progress_str}. {plan_str}. {logged_str}. {setup_str}."
 
 def get_daily_tally():
-    cursor = session_state["cursor"]
-    today = datetime.date.today()
-    cursor.execute("SELECT COUNT(*) FROM Exercise WHERE [Date] = ?", (today,))
-    exercise_count = cursor.fetchone()[0]
-    cursor.execute("SELECT COUNT(DISTINCT MealName) FROM ActualMeals WHERE [Date] = ? AND MealName IN ('Breakfast', 'Lunch', 'Dinner', 'Snack')", (today,))
-    meal_count = cursor.fetchone()[0]
+    exercise_count, meal_count = daily_tally.counts()
+    emit("tally", {"exercises": exercise_count, "meals": meal_count})
     return exercise_count, meal_count
 
+def submit_exercise(exercise_type, duration, calories):
+    minutes = duration if exercise_type != "Laps" else duration * 8 / 12
+    laps = duration if exercise_type == "Laps" else 0
+    weight = session_state["setup_data"].get("CurrentWeight")
+    if journal is not None:
+        today = datetime.date.today()
+        journal.append("exercise", date=today, type=exercise_type, minutes=minutes, laps=laps, calories=calories,
+                       weight=weight)
+        result = (today, calories)
+    else:
+        cursor = get_cursor()
+        cursor.execute(f"EXEC SubmitExercise @ExerciseType=?, @DurationMinutes=?, @CalorieBurn=?", 
+                       (exercise_type, minutes, calories))
+        result = cursor.fetchone()
+        cursor.execute("INSERT INTO ProgressLog (LogDate, Laps, CaloriesBurned, Weight) VALUES (?, ?, ?, ?)",
+                       (result[0], laps, result[1], weight))
+    after_commit(daily_tally.record_exercise, result[0])
+    plan_scheduler.notify_log(result[0])
+    invalidate_context()
+    emit("exercise_logged", {"type": exercise_type, "amount": duration, "calories": result[1]})
+    return result
+
+def log_actual(date, food_id, description, qty, total_cal, meal_name):
+    if journal is not None:
+        journal.append("meal", date=date, food_id=food_id, description=description, qty=qty, calories=total_cal,
+                       meal=meal_name)
+    else:
+        cursor = get_cursor()
+        cursor.execute("EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
+                       (date, food_id, description, qty, total_cal, meal_name))
+    after_commit(daily_tally.record_meal, date, meal_name)
+    plan_scheduler.notify_log(date)
+    invalidate_context()
+    emit("meal_logged", {"date": str(date), "meal": meal_name, "food": description, "qty": qty, "calories": total_cal})
+
+def log_deviation(date, reason):
+    if journal is not None:
+        journal.append("deviation", date=date, reason=reason)
+    else:
+        get_cursor().execute("EXEC LogDeviation @Date=?, @Reason=?", (date, reason))
+
+def log_weight(weight):
+    if journal is not None:
+        journal.append("weight", date=datetime.date.today(), weight=weight)
+    else:
+        get_cursor().execute("INSERT INTO WeightLog ([Date], RecordedWeight) VALUES (?, ?)", (datetime.date.today(), weight))
+    invalidate_context()
+    # Today's plan is keyed on the new weight; start on it while the rest of the check-in goes on.
+    # A session without the rest of the profile keeps the height and age already remembered.
+    profile = dict(plan_scheduler.profile or {})
+    profile.update(session_state["setup_data"], CurrentWeight=weight)
+    plan_scheduler.remember(profile)
+    plan_scheduler.request()
+
+@traced_handler
 def start_setup():
-    cursor = session_state["cursor"]
+    cursor = get_cursor()
     cursor.execute("EXEC InitializeAppSetup")
     results = cursor.fetchall()
     if results:
@@ -126,12 +568,13 @@ def start_setup():
     else:
         session_state["setup_step"] = 100
         exercise_count, meal_count = get_daily_tally()
-        add_message("Monika", ask_monika(f"Hey, babe! You’ve logged {exercise_count} exercises and {meal_count} out of 5 meals today. Any updates?", "Initial fitness mode load"))
+        add_message("Monika", ask_monika(f"Hey, babe! You’ve logged {exercise_count} exercises and {meal_count} out of 5 meals today. Any updates?", "Initial fitness mode load", cache=False))
         session_state["waiting_for_input"] = True
-    session_state["conn"].commit()
+    commit_db()
 
+@traced_handler
 def complete_setup():
-    cursor = session_state["cursor"]
+    cursor = get_cursor()
     data = session_state["setup_data"]
     required = ['StartWeight', 'TargetWeight', 'TargetDate', 'CurrentWeight', 'HeightCm', 'AgeYears']
     missing = [r for r in required if r not in data]
@@ -147,12 +590,13 @@ def complete_setup():
         )
         cursor.execute("UPDATE Goals SET StartWeight = ?, TargetWeight = ?, TargetDate = ? WHERE GoalType = 'LongTerm' AND Active = 1",
                        (data['StartWeight'], data['TargetWeight'], data['TargetDate']))
-        cursor.execute("INSERT INTO WeightLog ([Date], RecordedWeight) VALUES (?, ?)", (datetime.date.today(), data['CurrentWeight']))
-        session_state["conn"].commit()
+        log_weight(data['CurrentWeight'])
+        commit_db()
+        invalidate_context()
+        plan_scheduler.invalidate()
         context = "Day 1 setup completed, moving to food preferences."
         add_message("Monika", ask_monika("Setup’s done, sweetie! Let’s pick your meats next.", context))
-        cursor.execute("SELECT COUNT(*) FROM FoodItems WHERE Active = 1")
-        has_prefs = cursor.fetchone()[0] > 0
+        has_prefs = len(food_catalog) > 0
         if not has_prefs:
             cursor.execute("SELECT FoodID, FoodName, Active FROM FoodItems WHERE TotalCarbohydrates = 0 OR TotalCarbohydrates IS NULL")
             food_items = cursor.fetchall()
@@ -163,20 +607,22 @@ def complete_setup():
                                ("Bacon", 541, 37, 0, 42, 1))
                 cursor.execute("INSERT INTO FoodItems (FoodName, TotalCalories, Protein, TotalCarbohydrates, TotalFat, Active) VALUES (?, ?, ?, ?, ?, ?)",
                                ("Ground Beef (80/20)", 307, 17, 0, 26, 1))
-                session_state["conn"].commit()
+                commit_db()
             else:
                 prefs = ",".join(f"{food[0]}:{1 if food[2] else 0}" for food in food_items)
                 cursor.execute("EXEC UpdateFoodPreferences @FoodPreferences=?", (prefs,))
-                session_state["conn"].commit()
+                commit_db()
+            food_catalog.invalidate()
             add_message("Monika", ask_monika("Got your carnivore picks, love! Time to plan your day!", "Food prefs set to meat only."))
         session_state["setup_step"] = 100
         generate_today_plan()
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         add_message("Monika", f"Monika: Setup snag! Error: {e}")
         print(f"SETUP ERROR: {e}")
 
+@traced_handler
 def start_daily_check():
-    cursor = session_state["cursor"]
+    cursor = get_cursor()
     cursor.execute("EXEC DailyStartupCheck")
     results = cursor.fetchall()
     if results:
@@ -186,13 +632,15 @@ def start_daily_check():
         context = f"Daily startup, step 10, prompt 1 of {len(results)}: asking for {session_state['daily_prompts'][0][2]}."
         add_message("Monika", ask_monika(prompt, context))
         session_state["waiting_for_input"] = True
-    else:
+    # Today's plan if one is due and can be built; otherwise just the tally
+    elif plan_is_current() or not have_profile() or not generate_today_plan():
         session_state["setup_step"] = 100
         exercise_count, meal_count = get_daily_tally()
-        add_message("Monika", ask_monika(f"Hey, babe! You’ve logged {exercise_count} exercises and {meal_count} out of 5 meals today. Any updates?", "Fitness mode daily check"))
+        add_message("Monika", ask_monika(f"Hey, babe! You’ve logged {exercise_count} exercises and {meal_count} out of 5 meals today. Any updates?", "Fitness mode daily check", cache=False))
         session_state["waiting_for_input"] = True
-    session_state["conn"].commit()
+    commit_db()
 
+@traced_handler
 def handle_setup(message):
     if not session_state["setup_prompts"] or session_state["setup_step"] > len(session_state["setup_prompts"]):
         complete_setup()
@@ -221,31 +669,53 @@ def handle_setup(message):
     except ValueError:
         add_message("Monika", ask_monika(f"Oops, {param_name} needs a {'number' if param_name != 'TargetDate' else 'date'}—try again, love!", context))
 
-def calculate_baseline():
-    cursor = session_state["cursor"]
+PROFILE_FIELDS = ("CurrentWeight", "HeightCm", "AgeYears")
+
+# A plan needs the Day-1 profile. A session that never ran setup (another browser) fills in what
+# it's missing from the last profile the plan scheduler was given, and its weight from WeightLog;
+# False if it's still incomplete (after a restart, until someone runs setup or weighs in again).
+def have_profile():
     data = session_state["setup_data"]
+    if all(data.get(k) for k in PROFILE_FIELDS):
+        return True
+    profile = plan_scheduler.profile or {}
+    for key in PROFILE_FIELDS:
+        if not data.get(key) and profile.get(key):
+            data[key] = profile[key]
+    if not data.get("CurrentWeight"):
+        cursor = get_cursor()
+        cursor.execute("SELECT TOP 1 RecordedWeight FROM WeightLog ORDER BY [Date] DESC")
+        row = cursor.fetchone()
+        if row and row[0]:
+            data["CurrentWeight"] = float(row[0])
+    return all(data.get(k) for k in PROFILE_FIELDS)
+
+def calculate_baseline(data=None):
+    cursor = get_cursor()
+    data = data or session_state["setup_data"]
     cursor.execute("DECLARE @Calories INT; EXEC CalculateBaselineCalories @CurrentWeight = ?, @HeightCm = ?, @AgeYears = ?, @ActivityLevel = ?, @BaselineCalories = @Calories OUTPUT; SELECT @Calories",
-                   (data["CurrentWeight"], data["HeightCm"], data["AgeYears"], data["ActivityLevel"]))
+                   (data["CurrentWeight"], data["HeightCm"], data["AgeYears"], data.get("ActivityLevel", "SomewhatActive")))
     return cursor.fetchone()[0]
 
-def calculate_deficit():
-    cursor = session_state["cursor"]
-    data = session_state["setup_data"]
-    yesterday = datetime.date.today() - datetime.timedelta(days=1)
-    cursor.execute("SELECT ISNULL(SUM(CalorieBurn), 0) FROM DailyExerciseTotals WHERE [Date] = ?", (yesterday,))
-    burn = cursor.fetchone()[0]
-    cursor.execute("SELECT ISNULL(SUM(TotalCalories), 0) FROM ActualMeals WHERE [Date] = ?", (yesterday,))
-    intake = cursor.fetchone()[0]
+def calculate_deficit(data=None, day=None):
+    data = data or session_state["setup_data"]
+    yesterday = (day or datetime.date.today()) - datetime.timedelta(days=1)
+    cursor = get_cursor()
+    with journal_frozen():
+        cursor.execute("SELECT ISNULL(SUM(CalorieBurn), 0) FROM DailyExerciseTotals WHERE [Date] = ?", (yesterday,))
+        burn = cursor.fetchone()[0] + pending_calories("exercise", yesterday)
+        cursor.execute("SELECT ISNULL(SUM(TotalCalories), 0) FROM ActualMeals WHERE [Date] = ?", (yesterday,))
+        intake = cursor.fetchone()[0] + pending_calories("meal", yesterday)
     cursor.execute("DECLARE @Deficit INT; EXEC CalculateDailyDeficit @CurrentWeight = ?, @YesterdayBurn = ?, @YesterdayIntake = ?, @DailyDeficit = @Deficit OUTPUT; SELECT @Deficit",
                    (data["CurrentWeight"], burn, intake))
     return cursor.fetchone()[0]
 
+@traced_handler
 def handle_daily(message):
-    cursor = session_state["cursor"]
     step = session_state["setup_step"]
     if session_state["mode"] == "chat":
         context = get_db_context()
-        add_message("Monika", ask_monika(message, context))
+        add_message("Monika", ask_monika(message, context, cache=False, fallback=CHAT_FALLBACK))
         return
 
     if step == 10 and session_state["daily_prompts"]:
@@ -255,23 +725,19 @@ def handle_daily(message):
         try:
             if param_name == 'CurrentWeight':
                 weight = float(message.split()[0])
-                cursor.execute("INSERT INTO WeightLog ([Date], RecordedWeight) VALUES (?, ?)", (datetime.date.today(), weight))
+                log_weight(weight)
                 session_state["setup_data"]["CurrentWeight"] = weight
             elif param_name == 'YesterdayExercise':
                 if "no" in message.lower():
                     pass
                 else:
-                    match = re.search(r"(\d+(\.\d+)?)\s*(laps|miles|min|minutes)", message.lower())
-                    if match:
-                        duration = float(match.group(1))
-                        exercise_type = "Laps" if "laps" in message.lower() else "Walking"
+                    exercise = parse_exercise(message)
+                    if exercise:
+                        duration, unit = exercise
+                        exercise_type = "Laps" if unit == "laps" else "Walking"
                         cal_per_lap = 923 / 12
                         calories = int(duration * cal_per_lap) if exercise_type == "Laps" else None
-                        cursor.execute(f"EXEC SubmitExercise @ExerciseType=?, @DurationMinutes=?, @CalorieBurn=?", 
-                                       (exercise_type, duration if exercise_type != "Laps" else duration * 8 / 12, calories))
-                        result = cursor.fetchone()
-                        cursor.execute("INSERT INTO ProgressLog (LogDate, Laps, CaloriesBurned, Weight) VALUES (?, ?, ?, ?)",
-                                       (result[0], duration if exercise_type == "Laps" else 0, result[1], session_state["setup_data"]["CurrentWeight"]))
+                        submit_exercise(exercise_type, duration, calories)
                     else:
                         add_message("Monika", ask_monika("Say 'no' or like '12 laps', babe!", context))
                         return
@@ -280,54 +746,50 @@ def handle_daily(message):
                 if "nothing" in message.lower() or "skip" in message.lower():
                     pass
                 else:
-                    match = re.match(r"(\d+)g\s+(.+)", message, re.IGNORECASE)
-                    if match:
-                        qty, food = match.groups()
-                        cursor.execute("SELECT FoodID, TotalCalories FROM FoodItems WHERE FoodName = ? AND Active = 1", (food,))
-                        food_data = cursor.fetchone()
+                    entry = parse_food_qty(message)
+                    if entry:
+                        qty, food = entry
+                        food_data = food_catalog.lookup(food)
                         if food_data:
-                            total_cal = (float(qty) / 100) * food_data[1] if food_data[1] else 0
+                            total_cal = (float(qty) / 100) * food_data.calories if food_data.calories else 0
                             meal_name = param_name if param_name in ['Breakfast', 'Lunch', 'Dinner'] else 'Snack'
-                            cursor.execute("EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
-                                           (yesterday, food_data[0], food, qty, total_cal, meal_name))
+                            log_actual(yesterday, food_data.food_id, food, qty, total_cal, meal_name)
                         else:
-                            cursor.execute("EXEC LogDeviation @Date=?, @Reason=?", (yesterday, f"Ate non-carnivore {food} for {param_name}"))
-                            cursor.execute("EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
-                                           (yesterday, None, food, qty, 0, param_name if param_name in ['Breakfast', 'Lunch', 'Dinner'] else 'Snack'))
+                            log_deviation(yesterday, f"Ate non-carnivore {food} for {param_name}")
+                            log_actual(yesterday, None, food, qty, 0, param_name if param_name in ['Breakfast', 'Lunch', 'Dinner'] else 'Snack')
                     else:
                         add_message("Monika", ask_monika(f"Try '100g Ribeye' or 'nothing' for {param_name}, love!", context))
                         return
-            session_state["conn"].commit()
+            commit_db()
             session_state["daily_prompts"].pop(0)
             if session_state["daily_prompts"]:
                 next_prompt = session_state["daily_prompts"][0][1]
                 add_message("Monika", ask_monika(next_prompt, context))
                 session_state["waiting_for_input"] = True
-            else:
+            elif plan_is_current() or not have_profile() or not generate_today_plan():
                 session_state["setup_step"] = 100
                 exercise_count, meal_count = get_daily_tally()
-                add_message("Monika", ask_monika(f"Got it all, babe! You’ve logged {exercise_count} exercises and {meal_count} out of 5 meals today. Any updates?", context))
+                add_message("Monika", ask_monika(f"Got it all, babe! You’ve logged {exercise_count} exercises and {meal_count} out of 5 meals today. Any updates?", context, cache=False))
                 session_state["waiting_for_input"] = True
         except ValueError:
             add_message("Monika", ask_monika(f"Oops, {param_name} needs a number—try again, sweetie!", context))
     elif step == 100:  # Post-plan or ongoing updates
         context = "Step 100: Fitness mode—handling updates or queries."
         now = datetime.datetime.now().hour
-        if "what do i eat for" in message.lower():
-            meal_type = re.search(r"for\s+(\w+)", message.lower())
-            if meal_type and session_state["daily_plan"]:
-                meal = meal_type.group(1).capitalize()
+        intent, slots = router.route(message)
+        if intent == "plan_query":
+            if slots["meal"] and session_state["daily_plan"]:
+                meal = slots["meal"].capitalize()
                 plan = session_state["daily_plan"]["meals"]
                 meal_plan = next((m for m in plan if m[1].lower() == meal.lower() or (m[1].lower() == "snack" and meal.lower() == "snack")), None)
                 if meal_plan:
-                    add_message("Monika", ask_monika(f"For {meal}, dig into {meal_plan[2]} ({meal_plan[3]}g, {meal_plan[4]} cal), babe!", context))
+                    add_message("Monika", ask_monika(f"For {meal}, dig into {meal_plan[2]} ({meal_plan[3]}g, {meal_plan[4]} cal), babe!", context, cache=False))
                 else:
                     add_message("Monika", ask_monika(f"No {meal} in the plan, love—stick to what I gave you!", context))
-        elif "i ate" in message.lower():
-            meal_match = re.search(r"i ate\s+(\w+)", message.lower())
-            if meal_match:
-                meal_type = meal_match.group(1)
-                if "plan" in message.lower() or "suggested" in message.lower():
+        elif intent == "ate":
+            if slots["meal"]:
+                meal_type = slots["meal"]
+                if slots["plan"]:
                     log_meal(meal_type, is_plan=True, context=context)
                 else:
                     add_message("Monika", ask_monika(f"You ate {meal_type}? What’d you have—give me the meaty details (e.g., '100g Ribeye')!", context))
@@ -335,44 +797,36 @@ def handle_daily(message):
                     session_state["setup_step"] = 13
             else:
                 add_message("Monika", ask_monika("You ate what, babe? Say 'I ate breakfast' or something!", context))
-        elif re.search(r"(\d+)\s*(laps|miles|min|minutes)", message.lower()):
-            match = re.search(r"(\d+(\.\d+)?)\s*(laps|miles|min|minutes)", message.lower())
-            duration = float(match.group(1))
-            exercise_type = "Laps" if "laps" in message.lower() else "Walking"
+        elif intent == "exercise":
+            duration = float(slots["duration"])
+            exercise_type = "Laps" if slots["unit"] == "laps" else "Walking"
             cal_per_lap = 923 / 12
             calories = int(duration * cal_per_lap) if exercise_type == "Laps" else None
-            cursor.execute(f"EXEC SubmitExercise @ExerciseType=?, @DurationMinutes=?, @CalorieBurn=?", 
-                           (exercise_type, duration if exercise_type != "Laps" else duration * 8 / 12, calories))
-            result = cursor.fetchone()
-            cursor.execute("INSERT INTO ProgressLog (LogDate, Laps, CaloriesBurned, Weight) VALUES (?, ?, ?, ?)",
-                           (result[0], duration if exercise_type == "Laps" else 0, result[1], session_state["setup_data"]["CurrentWeight"]))
-            session_state["conn"].commit()
+            submit_exercise(exercise_type, duration, calories)
+            commit_db()
             exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"Logged {duration} {exercise_type.lower()}, babe! Now at {exercise_count} exercises and {meal_count}/5 meals today. What else?", context))
-        elif "fucked up" in message.lower() or "bacanator" in message.lower():
-            cursor.execute("EXEC LogDeviation @Date=?, @Reason=?", (datetime.date.today(), "Ate non-carnivore Bacanator combo"))
-            cursor.execute("EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
-                           (datetime.date.today(), None, "Bacanator combo", 1, 960, "Lunch"))
-            session_state["conn"].commit()
+            add_message("Monika", ask_monika(f"Logged {duration} {exercise_type.lower()}, babe! Now at {exercise_count} exercises and {meal_count}/5 meals today. What else?", context, cache=False))
+        elif intent == "slip":
+            log_deviation(datetime.date.today(), "Ate non-carnivore Bacanator combo")
+            log_actual(datetime.date.today(), None, "Bacanator combo", 1, 960, "Lunch")
+            commit_db()
             session_state["meals_logged_today"].append("lunch")
             exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"Oh, you naughty boy—a Bacanator? Logged it, now at {exercise_count} exercises and {meal_count}/5 meals. Back to meat tomorrow?", context))
-        elif "didn’t eat" in message.lower() or "skip" in message.lower():
-            meal_match = re.search(r"(didn’t eat|skip)\s+(\w+)", message.lower())
-            if meal_match:
-                meal_type = meal_match.group(2)
-                if meal_type.lower() in ["breakfast", "snack", "lunch", "dinner"]:
-                    session_state["meals_logged_today"].append(meal_type.lower())
-                    exercise_count, meal_count = get_daily_tally()
-                    add_message("Monika", ask_monika(f"Skipped {meal_type}? Got it, now at {exercise_count} exercises and {meal_count}/5 meals. What’s next?", context))
-                else:
-                    add_message("Monika", ask_monika("Skip what, love? Say 'I didn’t eat lunch'!", context))
-        elif missing := check_missing_meals() and now >= 7:
+            add_message("Monika", ask_monika(f"Oh, you naughty boy—a Bacanator? Logged it, now at {exercise_count} exercises and {meal_count}/5 meals. Back to meat tomorrow?", context, cache=False))
+        elif intent == "skip_meal":
+            meal_type = slots["meal"]
+            if meal_type and meal_type in MEALS:
+                session_state["meals_logged_today"].append(meal_type)
+                exercise_count, meal_count = get_daily_tally()
+                add_message("Monika", ask_monika(f"Skipped {meal_type}? Got it, now at {exercise_count} exercises and {meal_count}/5 meals. What’s next?", context, cache=False))
+            else:
+                add_message("Monika", ask_monika("Skip what, love? Say 'I didn’t eat lunch'!", context))
+        elif (missing := check_missing_meals()) and now >= 7:
             next_meal = missing[0]
-            add_message("Monika", ask_monika(f"Hey, babe, it’s {now}:00—you haven’t logged {next_meal} yet. Did you eat it or skip it?", context))
+            add_message("Monika", ask_monika(f"Hey, babe, it’s {now}:00—you haven’t logged {next_meal} yet. Did you eat it or skip it?", context, cache=False))
         else:
             exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"Got your plan, love—you’re at {exercise_count} exercises and {meal_count}/5 meals today. What do you want to update?", context))
+            add_message("Monika", ask_monika(f"Got your plan, love—you’re at {exercise_count} exercises and {meal_count}/5 meals today. What do you want to update?", context, cache=False))
     elif step == 13:  # Log meal details
         context = "Step 13: Logging today’s meal details—expecting 'quantity food' or 'no'."
         pending_meal = session_state["state"].get("pending_meal")
@@ -380,12 +834,11 @@ def handle_daily(message):
             if "no" in message.lower() or "didn’t" in message.lower():
                 session_state["meals_logged_today"].append(pending_meal.lower())
                 exercise_count, meal_count = get_daily_tally()
-                add_message("Monika", ask_monika(f"Skipped {pending_meal}? No worries—now at {exercise_count} exercises and {meal_count}/5 meals today. What else?", context))
+                add_message("Monika", ask_monika(f"Skipped {pending_meal}? No worries—now at {exercise_count} exercises and {meal_count}/5 meals today. What else?", context, cache=False))
                 del session_state["state"]["pending_meal"]
                 session_state["setup_step"] = 100
-            elif re.match(r"(\d+)g\s+(.+)", message, re.IGNORECASE):
-                match = re.match(r"(\d+)g\s+(.+)", message, re.IGNORECASE)
-                qty, food = match.groups()
+            elif entry := parse_food_qty(message):
+                qty, food = entry
                 log_meal(pending_meal, food, qty, is_plan=False, context=context)
                 del session_state["state"]["pending_meal"]
                 session_state["setup_step"] = 100
@@ -395,8 +848,8 @@ def handle_daily(message):
             add_message("Monika", ask_monika("What meal are we logging, love? Say 'I ate lunch' first!", context))
             session_state["setup_step"] = 100
 
+@traced_handler
 def log_meal(meal_type, food=None, qty=None, is_plan=True, context=""):
-    cursor = session_state["cursor"]
     today = datetime.date.today()
     if meal_type.lower() not in ["breakfast", "snack", "lunch", "dinner"]:
         add_message("Monika", ask_monika(f"{meal_type}? Pick breakfast, snack, lunch, or dinner, babe!", context))
@@ -410,33 +863,29 @@ def log_meal(meal_type, food=None, qty=None, is_plan=True, context=""):
         meal_plan = next((m for m in plan if m[1].lower() == meal_type.lower() or (m[1].lower() == "snack" and meal_type.lower() == "snack")), None)
         if meal_plan:
             food, qty, total_cal = meal_plan[2], meal_plan[3], meal_plan[4]
-            cursor.execute("SELECT FoodID FROM FoodItems WHERE FoodName = ? AND Active = 1", (food,))
-            food_id = cursor.fetchone()[0]
-            cursor.execute("EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
-                           (today, food_id, food, qty, total_cal, meal_type))
-            session_state["conn"].commit()
+            food_item = food_catalog.lookup(food)
+            food_id = food_item.food_id if food_item else None
+            log_actual(today, food_id, food, qty, total_cal, meal_type)
+            commit_db()
             session_state["meals_logged_today"].append(meal_type.lower())
             exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"Logged your {meal_type} as planned: {qty}g {food}, {total_cal} cal. Now at {exercise_count} exercises and {meal_count}/5 meals. What’s next?", context))
+            add_message("Monika", ask_monika(f"Logged your {meal_type} as planned: {qty}g {food}, {total_cal} cal. Now at {exercise_count} exercises and {meal_count}/5 meals. What’s next?", context, cache=False))
     elif food and qty:
-        cursor.execute("SELECT FoodID, TotalCalories FROM FoodItems WHERE FoodName = ? AND Active = 1", (food,))
-        food_data = cursor.fetchone()
+        food_data = food_catalog.lookup(food)
         if food_data:
-            total_cal = (float(qty) / 100) * food_data[1] if food_data[1] else 0
-            cursor.execute("EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
-                           (today, food_data[0], food, qty, total_cal, meal_type))
-            session_state["conn"].commit()
+            total_cal = (float(qty) / 100) * food_data.calories if food_data.calories else 0
+            log_actual(today, food_data.food_id, food, qty, total_cal, meal_type)
+            commit_db()
             session_state["meals_logged_today"].append(meal_type.lower())
             exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"Logged {qty}g {food} for {meal_type}, {total_cal} cal. Now at {exercise_count} exercises and {meal_count}/5 meals. Sticking to the plan?", context))
+            add_message("Monika", ask_monika(f"Logged {qty}g {food} for {meal_type}, {total_cal} cal. Now at {exercise_count} exercises and {meal_count}/5 meals. Sticking to the plan?", context, cache=False))
         else:
-            cursor.execute("EXEC LogDeviation @Date=?, @Reason=?", (today, f"Ate non-carnivore {food} for {meal_type}"))
-            cursor.execute("EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
-                           (today, None, food, qty, 0, meal_type))
-            session_state["conn"].commit()
+            log_deviation(today, f"Ate non-carnivore {food} for {meal_type}")
+            log_actual(today, None, food, qty, 0, meal_type)
+            commit_db()
             session_state["meals_logged_today"].append(meal_type.lower())
             exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"{food} for {meal_type}? That’s off the meat menu—logged as a slip-up! Now at {exercise_count} exercises and {meal_count}/5 meals. What else?", context))
+            add_message("Monika", ask_monika(f"{food} for {meal_type}? That’s off the meat menu—logged as a slip-up! Now at {exercise_count} exercises and {meal_count}/5 meals. What else?", context, cache=False))
 
 def check_missing_meals():
     now = datetime.datetime.now().hour
@@ -453,45 +902,171 @@ def check_missing_meals():
         expected.append("dinner")
     return expected
 
-def generate_today_plan():
-    cursor = session_state["cursor"]
-    baseline = calculate_baseline()
-    deficit = calculate_deficit()
+# Baseline, deficit and GenerateDailyPlan for one day; shared by the scheduler and the request path
+def build_plan(day, data):
+    cursor = get_cursor()
+    baseline = calculate_baseline(data)
+    deficit = calculate_deficit(data, day)
     target_calories = baseline - deficit
     context = f"Step 100: Generating today’s carnivore diet plan (5 meals), baseline {baseline} cal, target {target_calories} cal after {deficit} cal deficit based on goals."
-    
     cursor.execute("EXEC GenerateDailyPlan")
     results = cursor.fetchall()
-    if results and results[0][0]:
-        allowance = results[0][0]
-        fasting_day = results[0][5]
-        if fasting_day:
-            plan_text = results[0][2]
-            session_state["daily_plan"] = {"text": plan_text, "meals": [(0, "Fasting", "No food", 0, 0)]}
-            exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"{plan_text} Now at {exercise_count} exercises and {meal_count}/5 meals today. Any updates?", context))
+    if not results or not results[0][0]:
+        return None
+    allowance = results[0][0]
+    if results[0][5]:  # fasting day
+        plan_text = results[0][2]
+        meals = [(0, "Fasting", "No food", 0, 0)]
+    else:
+        plan_text = f"Here’s your carnivore feast for today ({allowance:.0f} cal total, aiming for {target_calories} cal):\n" + \
+                    "\n".join([f"{row[1]}: {row[2]} ({row[3]}g, {row[4]} cal)" for row in results])
+        meals = [(i, row[1], row[2], row[3], row[4]) for i, row in enumerate(results)]
+    return {"date": day.isoformat(), "text": plan_text, "meals": meals, "context": context, "message": None, "counts": None}
+
+def plan_prompt(plan, counts):
+    exercise_count, meal_count = counts
+    return f"{plan['text']} Now at {exercise_count} exercises and {meal_count}/5 meals today. Any updates?"
+
+# Runs on the scheduler thread: builds the plan and pre-generates Monika's message for it
+def precompute_plan(day, data):
+    with app.app_context():
+        g.session = Session("plan-scheduler")
+        g.session.setup_data = dict(data)
+        exc = None
+        try:
+            plan = build_plan(day, data)
+            commit_db()
+            if plan is not None:
+                plan["counts"] = daily_tally.counts()
+                # Without a model the message is left for the request path to generate
+                try:
+                    plan["message"] = ask_monika(plan_prompt(plan, plan["counts"]), plan["context"], cache=False,
+                                                 fallback=False)
+                except LLMUnavailable as e:
+                    print(f"LLM ERROR: plan message not precomputed - {e}")
+                    plan["message"] = None
+            return plan
+        except Exception as e:
+            exc = e
+            raise
+        finally:
+            release_db(exc)
+
+plan_scheduler = PlanScheduler(precompute_plan, run_at=datetime.time.fromisoformat(os.getenv("PLAN_PRECOMPUTE_AT", "00:05")))
+PLAN_WAIT_SECONDS = float(os.getenv("PLAN_WAIT_SECONDS", "10"))
+plan_scheduler.start()
+
+def plan_is_current():
+    plan = session_state["daily_plan"]
+    return bool(plan) and plan.get("date") == datetime.date.today().isoformat()
+
+# False if no plan came back (no GenerateDailyPlan rows, or a zero allowance); nothing is sent then
+@traced_handler
+def generate_today_plan():
+    today = datetime.date.today()
+    data = session_state["setup_data"]
+    plan_scheduler.remember(data)
+    plan = plan_scheduler.get(today, data, wait=PLAN_WAIT_SECONDS)
+    if plan is None:
+        version = plan_scheduler.version(today)
+        plan = build_plan(today, data)
+        if plan is not None:
+            plan_scheduler.put(today, data, plan, version)
+    if plan is not None:
+        session_state["daily_plan"] = {"date": plan["date"], "text": plan["text"], "meals": plan["meals"]}
+        counts = get_daily_tally()
+        if plan["message"] and tuple(plan["counts"]) == counts:
+            reply = plan["message"]
         else:
-            plan_text = f"Here’s your carnivore feast for today ({allowance:.0f} cal total, aiming for {target_calories} cal):\n" + \
-                        "\n".join([f"{row[1]}: {row[2]} ({row[3]}g, {row[4]} cal)" for row in results])
-            session_state["daily_plan"] = {"text": plan_text, "meals": [(i, row[1], row[2], row[3], row[4]) for i, row in enumerate(results)]}
-            exercise_count, meal_count = get_daily_tally()
-            add_message("Monika", ask_monika(f"{plan_text} Now at {exercise_count} exercises and {meal_count}/5 meals today. Any updates?", context))
+            reply = ask_monika(plan_prompt(plan, counts), plan["context"], cache=False)
+        add_message("Monika", reply)
         session_state["setup_step"] = 100
         session_state["waiting_for_input"] = True
         session_state["meals_logged_today"] = []
-    session_state["conn"].commit()
+    commit_db()
+    return plan is not None
+
+# Built static assets (python assets.py). Templates link them with asset_url("style.css") and
+# asset_srcset("monika_transparent.png"), which fall back to /static until a build exists
+asset_manifest = assets.Manifest()
+
+@app.context_processor
+def asset_helpers():
+    return {"asset_url": asset_manifest.url, "asset_srcset": asset_manifest.srcset}
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    return assets.send_asset(filename)
+
+# The template's plain /static links to the stylesheets and script get the built copies once a
+# build exists, so the stylesheet's sprite comes from the sized, hashed variants rather than the
+# 900 KB PNG, and the text is precompressed. Those URLs don't change with the content, so the
+# responses are revalidated by ETag rather than cached for a year.
+def static_file(filename):
+    built = asset_manifest.built(filename)
+    if built is None:
+        return app.send_static_file(filename)
+    return assets.send_asset(built, cache_control=assets.REVALIDATE)
+
+app.view_functions["static"] = static_file
+
+# Only the newest messages are rendered; history_before is the id the page scrolls back from
+# (None when there's nothing older), so first paint doesn't grow with the conversation
+def render_index():
+    messages = session_state["messages"][-INDEX_MESSAGES:]
+    before = messages[0]["id"] if messages and messages[0]["id"] > 1 else None
+    with metrics.span("render", "index.html"):
+        return render_template('index.html', messages=messages, state=session_state["state"],
+                               cursor=session_state.last_message_id, history_before=before)
 
 @app.route('/')
 def index():
     if session_state["setup_step"] == 0:
         start_setup()
-    return render_template('index.html', messages=session_state["messages"], state=session_state["state"])
+    update_mood()
+    return render_index()
+
+DB_DOWN_REPLY = "Ugh, I can't reach my notes right now, babe. Give me a minute and try that again?"
+
+# A request that can't reach the DB gets an apology from Monika instead of a 500, and the warm-up
+# thread re-probes the DB right away (taking it out of /readyz if it's really down)
+def db_unavailable(e):
+    g.db_broken = True
+    warmup.recheck("db")
+    print(f"DB ERROR: {request.endpoint} failed - {e}")
+    if "session" not in g:
+        return jsonify({"error": "Database unavailable"}), 503
+    add_message("Monika", DB_DOWN_REPLY)
+    if request.endpoint == "index":
+        return render_index()
+    return jsonify(message_delta(requested_cursor()))
+
+for error in DB_UNAVAILABLE:
+    app.register_error_handler(error, db_unavailable)
+
+# Infinite scroll: the page of messages before the given id, oldest first
+@app.route('/history')
+def history():
+    try:
+        before = int(request.args["before"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "before must be a message id"}), 400
+    limit = min(max(request.args.get("limit", INDEX_MESSAGES, type=int), 1), 200)
+    with metrics.span("history", "page", before=before):
+        messages, has_more = chat_history.page(g.sid, before, limit)
+    return jsonify({"messages": messages, "has_more": has_more,
+                    "before": messages[0]["id"] if messages and has_more else None})
 
 @app.route('/send', methods=['POST'])
 def send_chat():
     user_input = request.form.get('message')
+    since = requested_cursor()
     if not user_input:
-        return jsonify({"messages": session_state["messages"], "state": session_state["state"]})
+        return jsonify(message_delta(since))
+    process_message(user_input)
+    return jsonify(message_delta(since))
+
+def process_message(user_input):
     add_message("Joseph", user_input)
     session_state["waiting_for_input"] = False
     if session_state["mode"] == "fitness" and session_state["setup_step"] > 0 and session_state["setup_step"] < 10:
@@ -499,9 +1074,78 @@ def send_chat():
     elif session_state["mode"] == "fitness" and session_state["setup_step"] >= 10:
         handle_daily(user_input)
     else:
-        context = get_db_context()
-        add_message("Monika", ask_monika(user_input, context))
-    return jsonify({"messages": session_state["messages"], "state": session_state["state"]})
+        # Chat doesn't need the DB, so it keeps working (without the fitness context) while it's down
+        try:
+            context = get_db_context()
+        except DB_UNAVAILABLE as e:
+            g.db_broken = True
+            warmup.recheck("db")
+            print(f"DB ERROR: chatting without context - {e}")
+            context = "Fitness data is unavailable right now."
+        add_message("Monika", ask_monika(user_input, context, cache=False, fallback=CHAT_FALLBACK))
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# Same as /send, but streams Monika's reply tokens and the DB work as Server-Sent Events while the
+# message is handled on a worker thread. Ends with a "done" event carrying the message delta/state.
+@app.route('/send/stream', methods=['POST'])
+def send_chat_stream():
+    user_input = request.form.get('message')
+    since = requested_cursor()
+    if not user_input:
+        return jsonify(message_delta(since))
+    session = g.session
+    events = queue.Queue()
+
+    def work():
+        with app.app_context():
+            g.session = session
+            g.event_sink = events
+            exc = None
+            try:
+                process_message(user_input)
+            except Exception as e:
+                exc = e
+                print(f"STREAM ERROR: {e}")
+                if isinstance(e, DB_UNAVAILABLE):
+                    warmup.recheck("db")
+                emit("error", {"message": "Monika lost her train of thought—try again, babe!"})
+            finally:
+                release_db(exc)
+                events.put(None)
+
+    # The worker runs in a copy of this request's context so its spans land in the request's tree
+    context = contextvars.copy_context()
+
+    def generate():
+        worker = threading.Thread(target=context.run, args=(work,), daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                yield sse(*item)
+            yield sse("done", message_delta(since))
+        finally:
+            worker.join()
+            g.stream_open = False
+
+    g.stream_open = True
+    request_globals = g._get_current_object()
+
+    def close_unstarted():
+        # If the server never iterated the stream, its teardown never ran; let go of the session
+        if request_globals.pop("stream_open", False):
+            scope = request_globals.pop("session_scope", None)
+            if scope is not None:
+                scope.close()
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(close_unstarted)
+    return response
 
 @app.route('/toggle_mode', methods=['POST'])
 def toggle_mode():
@@ -513,7 +1157,103 @@ def toggle_mode():
     else:
         context = "Switching to Chat mode."
         add_message("Monika", ask_monika("Hey, sweetie! Just you and me now—what’s on your mind?", context))
-    return jsonify({"messages": session_state["messages"]})
+    return jsonify(message_delta(requested_cursor()))
+
+# Bulk import of historical meals/exercise/weight exports. The upload is kept under IMPORT_DIR,
+# named by its content hash, so posting the same file again after a failure resumes from the last
+# committed chunk. Progress is streamed as Server-Sent Events, ending with a "done" report.
+IMPORT_DIR = os.getenv("IMPORT_DIR", "imports")
+
+@app.route('/import', methods=['POST'])
+def import_history():
+    upload = request.files.get('file')
+    kind = request.form.get('kind') or None
+    if upload is None or not upload.filename:
+        return jsonify({"error": "upload a CSV or JSON export as 'file'"}), 400
+    if kind is not None and kind not in bulk_import.KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(bulk_import.KINDS)}"}), 400
+    try:
+        chunk_size = int(request.form.get('chunk_size') or 500)
+    except ValueError:
+        chunk_size = 0
+    if chunk_size < 1:
+        return jsonify({"error": "chunk_size must be a positive whole number"}), 400
+    ext = os.path.splitext(upload.filename)[1].lower() or ".csv"
+    path = bulk_import.save_upload(upload.stream, IMPORT_DIR, ext)
+    fmt = {".json": None, ".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}.get(ext)
+    events = queue.Queue()
+
+    def work():
+        try:
+            report = bulk_import.import_file(pool, path, kind, fmt, chunk_size,
+                                             progress=lambda report: events.put(("progress", report)))
+            daily_tally.reconcile()
+            # Imported rows are backdated, behind where the incremental reads pick up
+            trend_engine.notify(rebuild=True)
+            events.put(("done", report))
+        except (DB_UNAVAILABLE + (ValueError, bulk_import.BulkImportError)) as e:
+            if isinstance(e, DB_UNAVAILABLE):
+                warmup.recheck("db")
+            print(f"IMPORT ERROR: {path} - {e}")
+            events.put(("error", {"message": str(e), "resume": True}))
+        finally:
+            events.put(None)
+
+    def generate():
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        try:
+            while (item := events.get()) is not None:
+                yield sse(*item)
+        finally:
+            worker.join()
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Liveness: the process is up. Readiness: the DB and LLM client are (503 with the reasons until then).
+@app.route('/healthz')
+def healthz():
+    return jsonify({"status": "ok", "uptime": round(time.time() - warmup.started_at, 1), "warmup_alive": warmup.alive()})
+
+@app.route('/readyz')
+def readyz():
+    status = warmup.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+# Full trend report: weight series with its 7-day average, loss rate and goal projection, and
+# calories per week (with the balance against the baseline once setup is done)
+@app.route('/trends')
+def trends_endpoint():
+    report = update_mood()
+    data = session_state["setup_data"]
+    baseline = None
+    if report is not None and all(data.get(k) for k in PROFILE_FIELDS):
+        try:
+            baseline = calculate_baseline(data)
+        except DB_UNAVAILABLE as e:
+            g.db_broken = True
+            print(f"TRENDS ERROR: baseline unavailable - {e}")
+    return jsonify({"trends": trends.with_baseline(report, baseline), "state": session_state["state"]})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/stats')
+def stats():
+    return jsonify({
+        "response_cache": response_cache.snapshot(),
+        "food_catalog": dict(food_catalog.stats, hit_rate=round(food_catalog.hit_rate(), 4)),
+        "daily_tally": daily_tally.stats,
+        "chat_history": dict(chat_history.stats, queued=len(chat_history)),
+        "db_pool": dict(pool.stats, in_use=pool.in_use, size=pool.size),
+        "write_behind": journal.snapshot() if journal is not None else None,
+        "plan_scheduler": plan_scheduler.stats,
+        "trends": trend_engine.snapshot(),
+        "conversation_memory": conversation_memory.stats,
+        "llm_governor": llm_governor.snapshot(),
+    })
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,248 @@
+import os
+import io
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+import mimetypes
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Static asset build: resized WebP/AVIF/PNG variants of the Monika sprite, content-hashed copies
+# of script.js and the stylesheets (with the sprite's background rewritten to pick the smallest
+# format and size the browser can use) and precompressed .gz/.br files, all in static/dist with a
+# manifest. Hashed names never change content, so /assets serves them with a one-year immutable
+# Cache-Control; anything not built falls back to /static.
+#   python assets.py
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_NAME = "manifest.json"
+URL_PREFIX = "/assets/"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# For built files served under their plain /static name, which doesn't change with their content
+REVALIDATE = "no-cache"
+
+# Source image -> widths to produce (never upscaled past the original)
+IMAGES = {"monika_transparent.png": (480, 720, 1080)}
+TEXT_ASSETS = ("style.css", "styles.css", "script.js")
+COMPRESSIBLE = (".css", ".js", ".json", ".svg")
+
+# Best first: browsers take the first image-set entry whose type they support
+IMAGE_FORMATS = [
+    ("avif", "AVIF", "image/avif", {"quality": 55, "speed": 6}),
+    ("webp", "WEBP", "image/webp", {"quality": 82, "method": 6}),
+    ("png", "PNG", "image/png", {"optimize": True}),
+]
+
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("image/webp", ".webp")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(name, data, suffix="", ext=None):
+    base, original_ext = os.path.splitext(name)
+    return f"{base}{suffix}.{content_hash(data)}{ext or original_ext}"
+
+
+def _write(dist, name, data):
+    with open(os.path.join(dist, name), "wb") as f:
+        f.write(data)
+    return name
+
+
+def _compress(dist, name, data):
+    # mtime=0 keeps the .gz byte-identical across builds
+    _write(dist, name + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    encodings = ["gzip"]
+    if brotli is not None:
+        _write(dist, name + ".br", brotli.compress(data, quality=11))
+        encodings.insert(0, "br")
+    return encodings
+
+
+def image_formats():
+    if Image is None:
+        return []
+    try:
+        import pillow_avif  # noqa: F401 - registers AVIF on Pillow builds without it
+    except ImportError:
+        pass
+    Image.init()
+    return [f for f in IMAGE_FORMATS if f[1] in Image.SAVE]
+
+
+def build_image(name, widths, dist):
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        original = f.read()
+    entry = {"file": _write(dist, hashed_name(name, original), original), "variants": []}
+    formats = image_formats()
+    if not formats:
+        print(f"  {name}: Pillow isn't installed, copied without resized variants (pip install Pillow)")
+        return entry
+    with Image.open(io.BytesIO(original)) as img:
+        img.load()
+        entry["width"], entry["height"] = img.size
+        for width in sorted({min(w, img.width) for w in widths}):
+            if width == img.width:
+                resized = img
+            else:
+                resized = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+            for ext, fmt, mime, options in formats:
+                buf = io.BytesIO()
+                resized.save(buf, fmt, **options)
+                data = buf.getvalue()
+                file = _write(dist, hashed_name(name, data, f"-{width}w", f".{ext}"), data)
+                entry["variants"].append({"file": file, "width": width, "type": mime, "bytes": len(data)})
+    sizes = ", ".join(f"{v['width']}w {v['type'].split('/')[1]} {v['bytes'] // 1024} KB" for v in entry["variants"])
+    print(f"  {name}: {len(original) // 1024} KB -> {sizes}")
+    return entry
+
+
+def srcset(entry, mime="image/webp"):
+    return ", ".join(f"{URL_PREFIX}{v['file']} {v['width']}w" for v in entry["variants"] if v["type"] == mime)
+
+
+def _image_set(entry, one_x, two_x):
+    # Every format at 1x and 2x, in IMAGE_FORMATS order
+    options = []
+    for mime in dict.fromkeys(v["type"] for v in entry["variants"]):
+        for width, density in ((one_x, "1x"), (two_x, "2x")):
+            variant = next(v for v in entry["variants"] if v["type"] == mime and v["width"] == width)
+            options.append(f'url("{URL_PREFIX}{variant["file"]}") type("{mime}") {density}')
+            if one_x == two_x:
+                break
+    return "image-set(" + ", ".join(options) + ")"
+
+
+_STATIC_URL_RE = re.compile(r"""url\((['"]?)/static/([^'")]+)\1\)""")
+_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+
+
+def rewrite_css(css, images):
+    # Plain url()s point at the hashed original (for browsers without image-set()); each rule that
+    # uses a built image gets a background-image override per breakpoint, sized for 1x and 2x
+    overrides = []
+    for selector, body in _RULE_RE.findall(css):
+        for _, name in _STATIC_URL_RE.findall(body):
+            entry = images.get(name)
+            if not entry or not entry["variants"]:
+                continue
+            widths = sorted({v["width"] for v in entry["variants"]})
+            selector = selector.strip()
+            # Largest pair by default, then narrower viewports (later rules win) step down
+            rule = f"{selector} {{\n    background-image: {_image_set(entry, widths[max(len(widths) - 2, 0)], widths[-1])};\n}}"
+            overrides.append(rule)
+            for i in range(len(widths) - 3, -1, -1):
+                rule = f"{selector} {{\n    background-image: {_image_set(entry, widths[i], widths[i + 1])};\n}}"
+                overrides.append(f"@media (max-width: {widths[i]}px) {{\n{rule}\n}}")
+
+    def hashed(match):
+        entry = images.get(match.group(2))
+        return f'url("{URL_PREFIX}{entry["file"]}")' if entry else match.group(0)
+
+    css = _STATIC_URL_RE.sub(hashed, css)
+    return css + ("\n\n/* Built by assets.py */\n" + "\n\n".join(overrides) + "\n" if overrides else "")
+
+
+def build(dist=DIST_DIR):
+    # Rebuilt from scratch, so files from older builds don't pile up
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+    manifest = {"images": {}, "files": {}}
+    for name, widths in IMAGES.items():
+        manifest["images"][name] = build_image(name, widths, dist)
+    for name in TEXT_ASSETS:
+        path = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        if name.endswith(".css"):
+            data = rewrite_css(data.decode("utf-8"), manifest["images"]).encode("utf-8")
+        file = _write(dist, hashed_name(name, data), data)
+        encodings = _compress(dist, file, data) if name.endswith(COMPRESSIBLE) else []
+        manifest["files"][name] = {"file": file, "encodings": encodings, "bytes": len(data)}
+        print(f"  {name} -> {file} ({len(data) // 1024} KB{', ' + '/'.join(encodings) if encodings else ''})")
+    with open(os.path.join(dist, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# Lookups for templates; the manifest is reloaded when a rebuild replaces it
+class Manifest:
+    def __init__(self, dist=DIST_DIR):
+        self.path = os.path.join(dist, MANIFEST_NAME)
+        self._data = {"images": {}, "files": {}}
+        self._mtime = None
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self._data, self._mtime = {"images": {}, "files": {}}, None
+            return self._data
+        if mtime != self._mtime:
+            with open(self.path, encoding="utf-8") as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+        return self._data
+
+    def url(self, name):
+        data = self._load()
+        entry = data["files"].get(name) or data["images"].get(name)
+        return URL_PREFIX + entry["file"] if entry else "/static/" + name
+
+    def srcset(self, name, mime="image/webp"):
+        entry = self._load()["images"].get(name)
+        return srcset(entry, mime) if entry else ""
+
+    def built(self, name):
+        # The built file for a stylesheet or script, None until a build has one
+        entry = self._load()["files"].get(name)
+        return entry["file"] if entry else None
+
+
+def send_asset(filename, dist=DIST_DIR, cache_control=CACHE_CONTROL):
+    # Serves a built file, precompressed when the client accepts it. send_file's ETag comes from
+    # the file served, so the .br, .gz and plain responses each get their own
+    from flask import request, send_from_directory
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, mimetype=mimetype, conditional=True)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, mimetype=mimetype, conditional=True)
+    response.headers["Cache-Control"] = cache_control
+    if filename.endswith(COMPRESSIBLE):
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build hashed, resized and precompressed static assets.")
+    parser.add_argument("--out", default=DIST_DIR, help="output directory (default static/dist)")
+    args = parser.parse_args(argv)
+    print(f"Building assets into {args.out}")
+    build(args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
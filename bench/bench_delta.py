@@ -0,0 +1,40 @@
+# Response size and build time for /send as the conversation grows: the old full-history payload
+# vs. the delta payload (only messages newer than the client's cursor).
+#   python bench/bench_delta.py
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from session_store import Session
+
+STATE = {"progress": 0.5, "trend_data": {}, "happy": False, "sad": False, "typing": False}
+REPLY = "Monika: Logged 12.0 laps, babe! Now at 1 exercises and 2/5 meals today. What else?"
+
+
+def timed(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return body, (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    session = Session("bench")
+    print(f"{'history':>8} {'full bytes':>11} {'full us':>9} {'delta bytes':>12} {'delta us':>9}")
+    for size in (10, 100, 1000, 5000, 20000):
+        while len(session.messages) < size:
+            session.append_message("user", "Joseph: 12 laps")
+            session.append_message("monika", REPLY)
+        since = session.last_message_id
+        session.append_message("user", "Joseph: 12 laps")
+        session.append_message("monika", REPLY)
+        full, full_us = timed(lambda: json.dumps({"messages": session.messages, "state": STATE}))
+        delta, delta_us = timed(lambda: json.dumps({"messages": session.messages_since(since),
+                                                    "cursor": session.last_message_id, "reset": False, "state": STATE}))
+        print(f"{size:>8} {len(full):>11} {full_us:>9.1f} {len(delta):>12} {delta_us:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Step-100 intent matching: the old if/elif chain of `in message.lower()` tests and re.search
+# calls vs. the compiled IntentRouter, over the corpus of real user messages in
+# tests/test_intents.py, which checks each one's expected intent and slots.
+#   python bench/bench_intents.py
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tests"))
+from intents import router
+from test_intents import CORPUS
+
+
+# The pre-router dispatch from handle_daily, reduced to the classification it did
+def legacy_route(message):
+    if "what do i eat for" in message.lower():
+        meal_type = re.search(r"for\s+(\w+)", message.lower())
+        return "plan_query", meal_type.group(1) if meal_type else None
+    elif "i ate" in message.lower():
+        meal_match = re.search(r"i ate\s+(\w+)", message.lower())
+        plan = "plan" in message.lower() or "suggested" in message.lower()
+        return "ate", (meal_match.group(1) if meal_match else None, plan)
+    elif re.search(r"(\d+)\s*(laps|miles|min|minutes)", message.lower()):
+        match = re.search(r"(\d+(\.\d+)?)\s*(laps|miles|min|minutes)", message.lower())
+        exercise_type = "Laps" if "laps" in message.lower() else "Walking"
+        return "exercise", (float(match.group(1)), exercise_type)
+    elif "fucked up" in message.lower() or "bacanator" in message.lower():
+        return "slip", None
+    elif "didn’t eat" in message.lower() or "skip" in message.lower():
+        meal_match = re.search(r"(didn’t eat|skip)\s+(\w+)", message.lower())
+        return "skip_meal", meal_match.group(2) if meal_match else None
+    return "fallback", None
+
+
+def main():
+    messages = [message for message, _, _ in CORPUS]
+    number = 2000
+    for label, fn in (("legacy if/elif", legacy_route), ("IntentRouter", router.route)):
+        seconds = min(timeit.repeat(lambda: [fn(m) for m in messages], number=number, repeat=5))
+        print(f"{label:>15}: {seconds / (number * len(messages)) * 1e6:.2f} us/message")
+
+
+if __name__ == "__main__":
+    main()
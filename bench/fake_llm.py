@@ -0,0 +1,152 @@
+# Local stand-in for the xAI chat completions endpoint (OpenAI-compatible), for benchmarks.
+# Replies are canned words, delayed by a fixed time-to-first-token plus a per-token rate, with or
+# without stream=True. --slow-fraction sends that share of requests down a slow tail and
+# --error-rate fails some with a 503, for exercising the LLM governor.
+#   python bench/fake_llm.py --port 8808 --latency 0.4 --tokens-per-sec 60
+#   python bench/fake_llm.py --slow-fraction 0.05 --slow-latency 8 --error-rate 0.02
+#   XAI_BASE_URL=http://127.0.0.1:8808/v1 XAI_API_KEY=fake python app.py
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = ("Great job, babe! Keep that carnivore streak going, I'm so proud of you sweetie. "
+         "Let's crush the rest of today together, love.").split()
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(server.reply_tokens)]
+        completion_id = f"chatcmpl-{next(server.ids)}"
+        model = body.get("model", "fake")
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.errors += 1
+            self._send_json({"error": {"message": "Overloaded", "type": "server_error"}}, 503)
+            return
+        slow = random.random() < server.slow_fraction
+        if slow:
+            with server.lock:
+                server.slow += 1
+        time.sleep(server.slow_latency if slow else server.latency)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            try:
+                self._stream(completion_id, model, tokens, usage if include_usage else None)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on it (a hedged or timed-out request)
+                self.close_connection = True
+        else:
+            time.sleep(len(tokens) / server.tokens_per_sec)
+            self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens).strip()}}],
+                "usage": usage,
+            })
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, completion_id, model, tokens, usage=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def chunk(delta, finish=None, usage=None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            if usage is not None:
+                payload.update(choices=[], usage=usage)
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            time.sleep(1 / self.server.tokens_per_sec)
+            chunk({"content": token})
+        chunk({}, "stop")
+        if usage is not None:
+            chunk(None, usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.3, tokens_per_sec=80, reply_tokens=24,
+                 slow_fraction=0.0, slow_latency=5.0, error_rate=0.0):
+        super().__init__((host, port), FakeLLMHandler)
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_tokens = reply_tokens
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.slow = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-llm", daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=80)
+    parser.add_argument("--reply-tokens", type=int, default=24)
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="share of requests that take --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    args = parser.parse_args(argv)
+    server = FakeLLMServer(args.host, args.port, args.latency, args.tokens_per_sec, args.reply_tokens,
+                           args.slow_fraction, args.slow_latency, args.error_rate)
+    print(f"Fake LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
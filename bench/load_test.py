@@ -0,0 +1,199 @@
+# End-to-end load test: scripted user journeys against the Flask app in-process, with the SQLite
+# backend standing in for SQL Server's stored procedures and bench/fake_llm.py for the xAI API.
+# Reports p50/p95/p99 latency per step and overall requests/sec at each concurrency level.
+#   python bench/load_test.py --concurrency 1 4 16 --duration 20 --latency 0.3 --tokens-per-sec 80
+#   python bench/load_test.py --write-behind --json results.json
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fake_llm import FakeLLMServer
+
+SETUP_ANSWERS = {"StartWeight": "210", "TargetWeight": "180", "TargetDate": "2027-06-30", "HeightCm": "180",
+                 "AgeYears": "40"}
+DAILY_ANSWERS = {"CurrentWeight": "208.4", "YesterdayExercise": "12 laps", "Breakfast": "200g Beef Ribeye",
+                 "Snack1": "nothing", "Lunch": "150g Bacon", "Snack2": "nothing", "Dinner": "250g Ground Beef (80/20)"}
+LOG_MESSAGES = ["what do i eat for lunch", "i ate breakfast plan", "12 laps", "i ate lunch", "100g Bacon",
+                "skip dinner", "how am i doing?"]
+CHAT_MESSAGES = ["hey monika, long day at work", "what should i cook this weekend?", "tell me something nice"]
+
+# The page template isn't needed to measure "/", so a minimal one stands in when it's missing
+INDEX_TEMPLATE = "{% for m in messages %}<div>{{ m.content }}</div>{% endfor %}"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, label, seconds, ok):
+        with self.lock:
+            self.latencies[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        everything = []
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            everything.extend(values)
+            rows[label] = self._row(values, self.errors[label])
+        total = self._row(sorted(everything), sum(self.errors.values()))
+        total["rps"] = round(len(everything) / elapsed, 2) if elapsed else 0.0
+        return {"steps": rows, "total": total}
+
+    @staticmethod
+    def _row(values, errors):
+        return {"count": len(values), "errors": errors,
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1)}
+
+
+class VirtualUser:
+    def __init__(self, monika, recorder):
+        self.monika = monika
+        self.client = monika.app.test_client()
+        self.recorder = recorder
+
+    def request(self, label, method, path, **kwargs):
+        start = time.perf_counter()
+        response = self.client.open(path, method=method, **kwargs)
+        response.get_data()  # drains streamed responses
+        self.recorder.add(label, time.perf_counter() - start, response.status_code < 400)
+        return response
+
+    def send(self, label, message):
+        return self.request(label, "POST", "/send", data={"message": message})
+
+    def session(self):
+        cookie = self.client.get_cookie(self.monika.SESSION_COOKIE)
+        return self.monika.sessions.get(cookie.value)
+
+    def setup(self):
+        self.request("GET /", "GET", "/")
+        for _ in range(10):
+            session = self.session()
+            if not 0 < session.setup_step <= len(session.setup_prompts):
+                break
+            param = session.setup_prompts[session.setup_step - 1][2]
+            self.send("setup", SETUP_ANSWERS[param])
+
+    def daily_check(self):
+        self.request("toggle_mode", "POST", "/toggle_mode", data={"mode": "fitness"})
+        for _ in range(10):
+            session = self.session()
+            if session.setup_step != 10 or not session.daily_prompts:
+                break
+            self.send("daily_check", DAILY_ANSWERS[session.daily_prompts[0][2]])
+
+    def logging(self):
+        for message in LOG_MESSAGES:
+            self.send("log", message)
+
+    def chat(self):
+        self.request("toggle_mode", "POST", "/toggle_mode", data={"mode": "chat"})
+        for message in CHAT_MESSAGES[:2]:
+            self.send("chat", message)
+        self.request("chat_stream", "POST", "/send/stream", data={"message": random.choice(CHAT_MESSAGES)})
+
+
+def run_level(monika, concurrency, duration):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    journeys = ("daily_check", "logging", "chat")
+
+    def worker():
+        user = VirtualUser(monika, recorder)
+        user.setup()
+        i = 0
+        while time.monotonic() < deadline:
+            getattr(user, journeys[i % len(journeys)])()
+            i += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.perf_counter() - start)
+
+
+def print_level(concurrency, result):
+    print(f"\nconcurrency {concurrency}: {result['total']['count']} requests, {result['total']['rps']} req/s, "
+          f"{result['total']['errors']} errors")
+    print(f"  {'step':<13} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, row in list(result["steps"].items()) + [("all", result["total"])]:
+        print(f"  {label:<13} {row['count']:>6} {row['errors']:>6} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+              f"{row['p99_ms']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /send with a fake LLM and the SQLite backend.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=15, help="seconds per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=80)
+    parser.add_argument("--reply-tokens", type=int, default=24)
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="share of LLM calls on a slow tail")
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of LLM calls that fail with a 503")
+    parser.add_argument("--write-behind", action="store_true", help="run with WRITE_BEHIND=1")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    llm = FakeLLMServer(latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                        reply_tokens=args.reply_tokens, slow_fraction=args.slow_fraction,
+                        slow_latency=args.slow_latency, error_rate=args.error_rate).start()
+    workdir = tempfile.mkdtemp(prefix="monika-load-")
+    os.environ.update(
+        XAI_API_KEY="fake",
+        XAI_BASE_URL=llm.base_url,
+        DB_BACKEND="sqlite",
+        SQLITE_PATH=os.path.join(workdir, "monika.db"),
+        SESSION_BACKEND="memory",
+        DB_POOL_SIZE=os.environ.get("DB_POOL_SIZE", str(max(5, max(args.concurrency)))),
+        WRITE_BEHIND="1" if args.write_behind else "0",
+        WRITE_BEHIND_JOURNAL=os.path.join(workdir, "journal.jsonl"),
+        CHAT_HISTORY_PATH=os.path.join(workdir, "chat.db"),
+    )
+    import app as monika
+    from jinja2 import ChoiceLoader, DictLoader
+    monika.app.jinja_loader = ChoiceLoader([monika.app.jinja_loader, DictLoader({"index.html": INDEX_TEMPLATE})])
+    deadline = time.monotonic() + 30
+    while not monika.warmup.ready() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    print(f"fake LLM at {llm.base_url} ({args.latency}s to first token, {args.tokens_per_sec} tokens/s, "
+          f"{args.reply_tokens} tokens per reply); SQLite at {workdir}")
+    results = {}
+    for concurrency in args.concurrency:
+        results[concurrency] = run_level(monika, concurrency, args.duration)
+        print_level(concurrency, results[concurrency])
+    print(f"\nfake LLM served {llm.requests} completions ({llm.slow} slow, {llm.errors} failed)")
+    print(f"LLM governor: {monika.llm_governor.snapshot()}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import os
+import csv
+import sys
+import json
+import hashlib
+import argparse
+import datetime
+import tempfile
+
+from food_catalog import FoodCatalog
+
+# Bulk import of historical meals, exercise and weight from fitness-app exports (CSV, JSON array
+# or JSON Lines). Rows are streamed, normalized, validated against FoodItems in bulk and written
+# in chunked transactions with executemany (fast_executemany on pyodbc). Each chunk's transaction
+# also records how many rows of the file are done in ImportProgress, so a failed import picks up
+# where it stopped and a crash can never leave rows committed that the checkpoint doesn't cover.
+
+KINDS = ("meals", "exercise", "weight")
+
+# Column names seen in common exports, per field
+ALIASES = {
+    "kind": ["kind", "type", "record_type", "category"],
+    "date": ["date", "day", "logged_on", "timestamp", "datetime", "start_time"],
+    "meal": ["meal", "meal_name", "mealname", "meal_type"],
+    "food": ["food", "food_name", "foodname", "item", "description", "name"],
+    "quantity": ["quantity", "qty", "grams", "amount_g", "serving_g", "amount"],
+    "calories": ["calories", "kcal", "energy", "total_calories", "calorie_burn", "calories_burned"],
+    "exercise": ["exercise", "activity", "exercise_type", "workout"],
+    "duration": ["duration", "minutes", "duration_minutes", "duration_min"],
+    "weight": ["weight", "weight_lbs", "lbs", "body_weight", "recorded_weight"],
+}
+
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d.%m.%Y", "%Y/%m/%d", "%m/%d/%y"]
+
+MEAL_NAMES = {"breakfast": "Breakfast", "lunch": "Lunch", "dinner": "Dinner", "snack": "Snack",
+              "snack1": "Snack", "snack2": "Snack", "snacks": "Snack"}
+
+LOG_ACTUAL_SQL = "EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?"
+EXERCISE_SQL = "INSERT INTO Exercise ([Date], ExerciseTypeID, ExerciseType, DurationMinutes, CalorieBurn) VALUES (?, ?, ?, ?, ?)"
+# Type ids as the existing Exercise rows use them (the ExerciseTypes group of LookupValues)
+EXERCISE_TYPES_SQL = ("SELECT ExerciseType, MAX(ExerciseTypeID) FROM Exercise WHERE ExerciseTypeID IN "
+                      "(SELECT LookupID FROM LookupValues WHERE GroupName = 'ExerciseTypes') GROUP BY ExerciseType")
+WEIGHT_SQL = "INSERT INTO WeightLog ([Date], RecordedWeight) VALUES (?, ?)"
+
+# Plain enough DDL for SQL Server and SQLite; created on the first import against a database
+PROGRESS_TABLE_SQL = ("CREATE TABLE ImportProgress (ImportKey VARCHAR(64) NOT NULL PRIMARY KEY, "
+                      "RowsDone INT NOT NULL, Complete BIT NOT NULL, UpdatedAt DATETIME NULL)")
+PROGRESS_SQL = "SELECT RowsDone, Complete FROM ImportProgress WHERE ImportKey = ?"
+PROGRESS_UPDATE_SQL = "UPDATE ImportProgress SET RowsDone = ?, Complete = ?, UpdatedAt = ? WHERE ImportKey = ?"
+PROGRESS_INSERT_SQL = "INSERT INTO ImportProgress (ImportKey, RowsDone, Complete, UpdatedAt) VALUES (?, ?, ?, ?)"
+PROGRESS_DELETE_SQL = "DELETE FROM ImportProgress WHERE ImportKey = ?"
+
+
+class BulkImportError(Exception):
+    pass
+
+
+def parse_date(value):
+    value = str(value).strip()
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date {value!r}")
+
+
+def _number(value):
+    if value is None or str(value).strip() == "":
+        return None
+    return float(str(value).strip().rstrip("g").replace(",", ""))
+
+
+def _field(row, name):
+    for alias in ALIASES[name]:
+        value = row.get(alias)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def detect_format(stream):
+    start = stream.tell()
+    head = stream.read(256).lstrip()[:1]
+    stream.seek(start)
+    return "json" if head == "[" else "jsonl" if head == "{" else "csv"
+
+
+def _json_array(stream, block_size=1 << 16):
+    # The elements of a top-level JSON array, decoded one at a time as the stream is read
+    decoder = json.JSONDecoder()
+    buf, started = "", False
+    while True:
+        buf = buf.lstrip()
+        if not started and buf:
+            if buf[0] != "[":
+                raise BulkImportError("expected a JSON array")
+            buf, started = buf[1:], True
+            continue
+        if buf[:1] == ",":
+            buf = buf[1:]
+            continue
+        if buf[:1] == "]":
+            return
+        if buf:
+            try:
+                item, end = decoder.raw_decode(buf)
+            except ValueError:
+                pass
+            else:
+                yield item
+                buf = buf[end:]
+                continue
+        more = stream.read(block_size)
+        if not more:
+            raise BulkImportError("the JSON array ends early" if started else "the file is empty")
+        buf += more
+
+
+def read_rows(stream, fmt=None):
+    # Yields one dict per record with lowercased keys, reading the stream incrementally
+    fmt = fmt or detect_format(stream)
+    if fmt == "csv":
+        rows = csv.DictReader(stream)
+    elif fmt == "json":
+        rows = _json_array(stream)
+    elif fmt == "jsonl":
+        rows = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise BulkImportError(f"unknown format {fmt!r}")
+    for row in rows:
+        yield {str(k).strip().lower().replace(" ", "_"): v for k, v in row.items()}
+
+
+def normalize(row, kind=None):
+    kind = (kind or _field(row, "kind") or "").lower()
+    if kind not in KINDS:
+        kind = "meals" if _field(row, "food") else "exercise" if _field(row, "exercise") else "weight" if _field(row, "weight") else kind
+    if kind not in KINDS:
+        raise ValueError("can't tell whether this row is a meal, exercise or weight")
+    date = parse_date(_field(row, "date"))
+    if kind == "weight":
+        weight = _number(_field(row, "weight"))
+        if weight is None:
+            raise ValueError("weight row without a weight")
+        return kind, {"date": date, "weight": weight}
+    if kind == "exercise":
+        exercise = (_field(row, "exercise") or "Walking").strip()
+        duration = _number(_field(row, "duration"))
+        calories = _number(_field(row, "calories"))
+        return kind, {"date": date, "exercise": exercise, "duration": duration,
+                      "calories": int(round(calories)) if calories is not None else None}
+    food = (_field(row, "food") or "").strip()
+    if not food:
+        raise ValueError("meal row without a food")
+    meal = MEAL_NAMES.get(str(_field(row, "meal") or "snack").strip().lower().replace(" ", ""), "Snack")
+    return kind, {"date": date, "meal": meal, "food": food, "quantity": _number(_field(row, "quantity")) or 100,
+                  "calories": _number(_field(row, "calories"))}
+
+
+# How far the import of one file (keyed by its content) has got, kept in ImportProgress. record()
+# runs inside the caller's transaction, so the count commits or rolls back with the chunk.
+class Checkpoint:
+    def __init__(self, key):
+        self.key = key
+        self.rows_done = 0
+        self.complete = False
+
+    def load(self, conn, cursor):
+        if not self.key:
+            return
+        try:
+            cursor.execute(PROGRESS_SQL, (self.key,))
+            row = cursor.fetchone()
+        except Exception as e:
+            if not _missing_table(e):
+                raise
+            # First import against this database
+            conn.rollback()
+            cursor.execute(PROGRESS_TABLE_SQL)
+            conn.commit()
+            row = None
+        if row:
+            self.rows_done, self.complete = int(row[0]), bool(row[1])
+
+    def record(self, cursor, rows_done, complete=False):
+        if not self.key:
+            return
+        now = datetime.datetime.now()
+        cursor.execute(PROGRESS_UPDATE_SQL, (rows_done, int(complete), now, self.key))
+        if cursor.rowcount == 0:
+            cursor.execute(PROGRESS_INSERT_SQL, (self.key, rows_done, int(complete), now))
+
+
+def _missing_table(error):
+    # SQL Server's "Invalid object name" (SQLSTATE 42S02), or SQLite's "no such table"
+    return bool(error.args) and error.args[0] == "42S02" or "no such table" in str(error).lower()
+
+
+def save_upload(stream, directory, ext, block_size=1 << 20):
+    # Copies an upload into directory a block at a time, hashing it on the way, and names it by
+    # its content: the same file posted again lands on the same path and resumes from its checkpoint
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha1()
+    fd, tmp = tempfile.mkstemp(suffix=".part", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for block in iter(lambda: stream.read(block_size), b""):
+                digest.update(block)
+                f.write(block)
+        path = os.path.join(directory, digest.hexdigest()[:12] + ext)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return path
+
+
+def import_key(source_path):
+    digest = hashlib.sha1()
+    with open(source_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def forget(pool, key):
+    # Drops the saved progress, so the file is imported again from the start
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        Checkpoint(key).load(conn, cursor)
+        cursor.execute(PROGRESS_DELETE_SQL, (key,))
+        conn.commit()
+
+
+# Writes normalized rows through one pooled connection, one transaction per chunk
+class BulkImporter:
+    def __init__(self, pool, chunk_size=500, progress=None):
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda report: None)
+
+    def run(self, rows, kind=None, checkpoint=None):
+        checkpoint = checkpoint or Checkpoint(None)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            checkpoint.load(conn, cursor)
+            report = {"rows": 0, "skipped": checkpoint.rows_done, "imported": {k: 0 for k in KINDS},
+                      "unknown_foods": 0, "errors": [], "complete": False}
+            if checkpoint.complete:
+                report.update(complete=True, already_imported=True)
+                return report
+            catalog = FoodCatalog(lambda: cursor)
+            exercise_types = self._exercise_types(cursor)
+            chunk = []
+            for index, raw in enumerate(rows):
+                if index < checkpoint.rows_done:
+                    continue
+                try:
+                    chunk.append(normalize(raw, kind))
+                except (ValueError, TypeError) as e:
+                    chunk.append(None)
+                    if len(report["errors"]) < 100:
+                        report["errors"].append({"row": index + 1, "error": str(e)})
+                if len(chunk) >= self.chunk_size:
+                    self._write(conn, cursor, chunk, catalog, exercise_types, report, checkpoint)
+                    chunk = []
+                    self.progress(dict(report, rows_done=checkpoint.rows_done))
+            self._write(conn, cursor, chunk, catalog, exercise_types, report, checkpoint, complete=True)
+        report["complete"] = True
+        self.progress(dict(report, rows_done=checkpoint.rows_done))
+        return report
+
+    @staticmethod
+    def _exercise_types(cursor):
+        cursor.execute(EXERCISE_TYPES_SQL)
+        return {str(name).lower(): type_id for name, type_id in cursor.fetchall()}
+
+    def _write(self, conn, cursor, chunk, catalog, exercise_types, report, checkpoint, complete=False):
+        meals, exercises, weights = [], [], []
+        for item in chunk:
+            report["rows"] += 1
+            if item is None:
+                continue
+            kind, row = item
+            if kind == "meals":
+                food = catalog.lookup(row["food"])
+                calories = row["calories"]
+                if calories is None:
+                    calories = row["quantity"] / 100 * float(food.calories) if food and food.calories else 0
+                if food is None:
+                    report["unknown_foods"] += 1
+                meals.append((row["date"], food.food_id if food else None, row["food"], row["quantity"],
+                               calories, row["meal"]))
+            elif kind == "exercise":
+                exercises.append((row["date"], exercise_types.get(row["exercise"].lower()), row["exercise"],
+                                  row["duration"], row["calories"]))
+            else:
+                weights.append((row["date"], row["weight"]))
+        batches = (("meals", LOG_ACTUAL_SQL, meals), ("exercise", EXERCISE_SQL, exercises),
+                   ("weight", WEIGHT_SQL, weights))
+        cursor.fast_executemany = True
+        try:
+            for _, sql, params in batches:
+                if params:
+                    cursor.executemany(sql, params)
+            checkpoint.record(cursor, checkpoint.rows_done + len(chunk), complete)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.fast_executemany = False
+        checkpoint.rows_done += len(chunk)
+        checkpoint.complete = complete
+        for key, _, params in batches:
+            report["imported"][key] += len(params)
+
+
+def import_file(pool, path, kind=None, fmt=None, chunk_size=500, progress=None, resume=True):
+    checkpoint = Checkpoint(import_key(path) if resume else None)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return BulkImporter(pool, chunk_size, progress).run(read_rows(f, fmt), kind, checkpoint)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import historical meals, exercise and weight into MonikaTracker.")
+    parser.add_argument("files", nargs="+", help="CSV, JSON or JSON Lines exports")
+    parser.add_argument("--kind", choices=KINDS, help="record type, if the file doesn't say per row")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"], help="input format (default: detect)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="rows per transaction")
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints and start over")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from db_pool import create_pool
+
+    load_dotenv()
+    pool = create_pool()
+
+    def progress(report):
+        print(f"  {report['rows_done']} rows committed "
+              f"({', '.join(f'{k}: {v}' for k, v in report['imported'].items())}, "
+              f"{report['unknown_foods']} unknown foods, {len(report['errors'])} bad rows)")
+
+    for path in args.files:
+        if args.restart:
+            forget(pool, import_key(path))
+        print(f"Importing {path}...")
+        report = import_file(pool, path, args.kind, args.format, args.chunk_size, progress)
+        for error in report["errors"]:
+            print(f"  row {error['row']}: {error['error']}")
+        if report.get("already_imported"):
+            print(f"Skipped: {path} was already imported (use --restart to import it again)")
+        else:
+            print(f"Done: {path}" + (f" (resumed after {report['skipped']} rows)" if report["skipped"] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import time
+import sqlite3
+import threading
+from collections import deque
+
+# The primary key is the (session, id) index: a page is one range scan, however long the chat
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ChatMessages (
+    SessionID TEXT NOT NULL,
+    MessageID INTEGER NOT NULL,
+    Role TEXT NOT NULL,
+    Content TEXT NOT NULL,
+    CreatedAt REAL NOT NULL,
+    PRIMARY KEY (SessionID, MessageID)
+) WITHOUT ROWID;
+"""
+# A stored message is never overwritten: ids only repeat if a session restarted at 1 because its
+# restore failed, and then the older message is the one to keep
+INSERT_SQL = ("INSERT OR IGNORE INTO ChatMessages (SessionID, MessageID, Role, Content, CreatedAt) "
+              "VALUES (?, ?, ?, ?, ?)")
+PAGE_SQL = ("SELECT MessageID, Role, Content FROM ChatMessages WHERE SessionID = ? AND MessageID < ? "
+            "ORDER BY MessageID DESC LIMIT ?")
+
+HistoryError = sqlite3.Error
+
+
+# Every chat message, kept in a local SQLite file so history survives restarts and the session
+# only has to hold the recent end of it. append() queues the message and returns; a background
+# thread inserts queued messages in batches, one transaction per batch. Reads merge in anything
+# still queued, so a page is never missing a message that was just sent. The file is separate
+# from the fitness database, so chat keeps its history while that's down. WAL mode lets worker
+# processes share the file.
+class ChatHistory:
+    def __init__(self, path, batch_size=200, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._mutex = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._local = threading.local()
+        self._thread = None
+        self.stats = {"appended": 0, "flushed": 0, "batches": 0, "failures": 0, "pages": 0, "restored": 0,
+                      "conflicts": 0}
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+
+    def _db(self):
+        # One connection per thread; SQLite connections aren't shared across threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=30)
+        return db
+
+    def append(self, sid, message):
+        with self._mutex:
+            self._pending.append((sid, message["id"], message["role"], message["content"], time.time()))
+            self.stats["appended"] += 1
+            backlog = len(self._pending)
+        if backlog >= self.batch_size:
+            self._wake.set()
+
+    def _queued(self, sid, before):
+        with self._mutex:
+            return [{"id": row[1], "role": row[2], "content": row[3]}
+                    for row in self._pending if row[0] == sid and row[1] < before]
+
+    def page(self, sid, before=None, limit=50):
+        # Up to limit messages older than before (newest if None), oldest first, and whether
+        # there are more before them
+        before = before if before is not None else 1 << 62
+        queued = self._queued(sid, before)
+        rows = self._db().execute(PAGE_SQL, (sid, before, limit + 1)).fetchall()
+        stored = {row[0]: {"id": row[0], "role": row[1], "content": row[2]} for row in rows}
+        stored.update((m["id"], m) for m in queued)
+        messages = sorted(stored.values(), key=lambda m: m["id"])
+        has_more = len(messages) > limit
+        self.stats["pages"] += 1
+        return messages[len(messages) - limit:] if has_more else messages, has_more
+
+    def restore(self, session, limit=50):
+        # A session the store no longer has (after a restart, or idle expiry) picks up its recent
+        # messages again, and new ids carry on after the last stored one
+        messages, _ = self.page(session.sid, limit=limit)
+        if messages:
+            session.messages = messages
+            session.next_message_id = messages[-1]["id"] + 1
+            self.stats["restored"] += 1
+        return len(messages)
+
+    def flush_once(self):
+        with self._flush_lock:
+            with self._mutex:
+                batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+            if not batch:
+                return 0
+            db = self._db()
+            before = db.total_changes
+            try:
+                with db:
+                    db.executemany(INSERT_SQL, batch)
+            except sqlite3.Error as e:
+                self.stats["failures"] += 1
+                print(f"HISTORY ERROR: insert of {len(batch)} messages failed - {e}")
+                raise
+            conflicts = len(batch) - (db.total_changes - before)
+            if conflicts:
+                print(f"HISTORY ERROR: {conflicts} messages reused stored ids and were dropped")
+            with self._mutex:
+                for _ in batch:
+                    self._pending.popleft()
+                self.stats["flushed"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["conflicts"] += conflicts
+            return len(batch)
+
+    def flush(self):
+        try:
+            while self.flush_once():
+                pass
+        except sqlite3.Error:
+            pass
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _run(self):
+        delay = self.flush_interval
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                while self.flush_once():
+                    pass
+                delay = self.flush_interval
+            except sqlite3.Error:
+                # Locked or out of disk: the messages stay queued and are retried
+                delay = min(delay * 2, 30)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="chat-history", daemon=True)
+            self._thread.start()
@@ -0,0 +1,109 @@
+import queue
+import bisect
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Per-message overhead the chat format adds on top of the content
+MESSAGE_TOKENS = 4
+ROLES = {"user": "user", "monika": "assistant"}
+
+
+if tiktoken is not None:
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+else:
+    def count_tokens(text):
+        # Roughly four characters per token for English; close enough for a budget
+        return max(1, len(text) // 4)
+
+
+def _turn(message):
+    # Messages are stored as "Joseph: ..." / "Monika: ..."; the role already says who spoke
+    sender, sep, text = message["content"].partition(": ")
+    if not sep or " " in sender:
+        text = message["content"]
+    return {"role": ROLES.get(message["role"], "user"), "content": text}
+
+
+# Bounded conversation history for the LLM. window() returns the newest turns that fit in
+# budget tokens, plus a rolling summary of everything older. Turns that fall out of the window
+# are folded into the summary on a background thread once there are summarize_after tokens of
+# them, so the request path never waits on a summary call. Progress is kept on the session as
+# memory = {"summary", "through": id of the last message summarized}.
+class ConversationMemory:
+    def __init__(self, sessions, summarize, budget=1500, summarize_after=300, count=count_tokens):
+        self.sessions = sessions
+        self.summarize = summarize
+        self.budget = budget
+        self.summarize_after = summarize_after
+        self.count = count
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._mutex = threading.Lock()
+        self._thread = None
+        self.stats = {"windows": 0, "summaries": 0, "summarized_messages": 0, "failures": 0, "discarded": 0}
+
+    def window(self, session, skip_last_user=False):
+        memory = session.memory
+        messages = session.messages
+        if skip_last_user and messages and messages[-1]["role"] == "user":
+            messages = messages[:-1]
+        start = bisect.bisect_right(messages, memory["through"], key=lambda m: m.get("id", 0))
+        unsummarized = messages[start:]
+        kept, used = [], 0
+        for message in reversed(unsummarized):
+            cost = self.count(message["content"]) + MESSAGE_TOKENS
+            if used + cost > self.budget:
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+        older = unsummarized[:len(unsummarized) - len(kept)]
+        if older and sum(self.count(m["content"]) for m in older) >= self.summarize_after:
+            self._schedule(session.sid, memory, older)
+        self.stats["windows"] += 1
+        return memory["summary"], [_turn(m) for m in kept], used
+
+    def _schedule(self, sid, memory, older):
+        with self._mutex:
+            if sid in self._queued:
+                return
+            self._queued.add(sid)
+        self._queue.put((sid, memory["through"], memory["summary"], [dict(m) for m in older]))
+
+    def _fold(self, sid, through, summary, older):
+        text = self.summarize(summary, [m["content"] for m in older])
+        new_through = older[-1]["id"]
+        with self.sessions.lock(sid):
+            session = self.sessions.get(sid)
+            # The session expired, or this range was already folded in
+            if session.memory["through"] != through or session.last_message_id < new_through:
+                self.stats["discarded"] += 1
+                return
+            session.memory = {"summary": text, "through": new_through}
+            self.sessions.save(sid, session)
+        self.stats["summaries"] += 1
+        self.stats["summarized_messages"] += len(older)
+
+    def _run(self):
+        while True:
+            sid, through, summary, older = self._queue.get()
+            try:
+                self._fold(sid, through, summary, older)
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"MEMORY ERROR: summary for {sid[:8]} failed - {e}")
+            finally:
+                with self._mutex:
+                    self._queued.discard(sid)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="conversation-memory", daemon=True)
+            self._thread.start()
@@ -0,0 +1,104 @@
+import datetime
+import threading
+
+TALLY_MEALS = ("breakfast", "lunch", "dinner", "snack")
+
+EXERCISE_COUNT_QUERY = "SELECT COUNT(*) FROM Exercise WHERE [Date] = ?"
+MEAL_NAMES_QUERY = ("SELECT DISTINCT MealName FROM ActualMeals WHERE [Date] = ? "
+                    "AND MealName IN ('Breakfast', 'Lunch', 'Dinner', 'Snack')")
+
+
+def _day(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+# Today's exercise and meal counts, kept in memory. The code that calls SubmitExercise/LogActual
+# records each write here once it's committed, so reads never touch the DB. A background thread seeds the counts at
+# startup and day rollover, and periodically reconciles them against the DB to pick up writes
+# made by other processes.
+class DailyTally:
+    def __init__(self, pool, reconcile_interval=300):
+        self.pool = pool
+        self.reconcile_interval = reconcile_interval
+        self.day = datetime.date.today()
+        self.exercises = 0
+        self.meals = set()
+        self.seeded = False
+        self._mutex = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"reads": 0, "seeds": 0, "reconciles": 0, "drift": 0}
+
+    def _rollover(self):
+        today = datetime.date.today()
+        if today != self.day:
+            self.day, self.exercises, self.meals, self.seeded = today, 0, set(), False
+            self._wake.set()
+
+    def counts(self):
+        with self._mutex:
+            self._rollover()
+            self.stats["reads"] += 1
+            return self.exercises, len(self.meals)
+
+    def record_exercise(self, date):
+        with self._mutex:
+            self._rollover()
+            if _day(date) == self.day:
+                self.exercises += 1
+
+    def record_meal(self, date, meal_name):
+        meal = (meal_name or "").lower()
+        with self._mutex:
+            self._rollover()
+            if _day(date) == self.day and meal in TALLY_MEALS:
+                self.meals.add(meal)
+
+    def _fetch(self, day):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(EXERCISE_COUNT_QUERY, (day,))
+            exercises = cursor.fetchone()[0]
+            cursor.execute(MEAL_NAMES_QUERY, (day,))
+            meals = {row[0].lower() for row in cursor.fetchall()}
+        return exercises, meals
+
+    def reconcile(self):
+        with self._mutex:
+            self._rollover()
+            day = self.day
+        exercises, meals = self._fetch(day)
+        with self._mutex:
+            if day != self.day:
+                return
+            # Nothing deletes these rows and only committed writes are recorded, so the DB can only
+            # be ahead of memory (writes from other processes, or ones committed but not yet
+            # recorded when the counts were read)
+            if self.seeded and (exercises > self.exercises or not meals <= self.meals):
+                print(f"TALLY: drift for {day} - memory {self.exercises}/{sorted(self.meals)}, "
+                      f"DB {exercises}/{sorted(meals)}")
+                self.stats["drift"] += 1
+            self.stats["reconciles" if self.seeded else "seeds"] += 1
+            self.exercises = max(self.exercises, exercises)
+            self.meals |= meals
+            self.seeded = True
+
+    def _run(self):
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"TALLY ERROR: reconcile failed - {e}")
+            tomorrow = datetime.datetime.combine(self.day + datetime.timedelta(days=1), datetime.time())
+            until_midnight = (tomorrow - datetime.datetime.now()).total_seconds()
+            self._wake.wait(max(1, min(self.reconcile_interval, until_midnight + 1)))
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="daily-tally", daemon=True)
+            self._thread.start()
@@ -0,0 +1,194 @@
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+import sqlite_backend
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class DatabaseUnavailable(Exception):
+    pass
+
+
+# Bounded pool of DB connections. Each request checks one out and returns it when done, so a
+# threaded server never shares a cursor between requests. Idle connections are health-checked
+# before reuse and dropped ones are replaced, reconnecting with exponential backoff.
+class ConnectionPool:
+    def __init__(self, connect, size=5, checkout_timeout=10, health_query="SELECT 1",
+                 check_after=30, retries=5, backoff=0.5, max_backoff=30, errors=(Exception,)):
+        self.connect = connect
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.health_query = health_query
+        self.check_after = check_after
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.errors = errors
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._mutex = threading.Lock()
+        self.stats = {"checkouts": 0, "waits": 0, "reconnects": 0, "discarded": 0, "timeouts": 0}
+
+    def _open(self):
+        delay = self.backoff
+        for attempt in range(1, self.retries + 1):
+            try:
+                return self.connect()
+            except self.errors as e:
+                if attempt == self.retries:
+                    raise
+                print(f"DB POOL: connect attempt {attempt} failed - {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def _healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_query)
+            cursor.fetchall()
+            return True
+        except self.errors:
+            return False
+
+    def _discard(self, conn):
+        with self._mutex:
+            self._created -= 1
+            self.stats["discarded"] += 1
+        try:
+            conn.close()
+        except self.errors:
+            pass
+
+    def _reserve(self):
+        with self._mutex:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+
+    def _new_connection(self):
+        try:
+            return self._open()
+        except BaseException:
+            with self._mutex:
+                self._created -= 1
+            raise
+
+    def checkout(self, timeout=None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        while True:
+            try:
+                conn, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve():
+                    conn = self._new_connection()
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(f"No DB connection free after {timeout}s ({self.size} in use)")
+                self.stats["waits"] += 1
+                try:
+                    conn, returned_at = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+            if time.time() - returned_at < self.check_after or self._healthy(conn):
+                break
+            print("DB POOL: dropped connection detected, reconnecting")
+            self._discard(conn)
+            self.stats["reconnects"] += 1
+        self.stats["checkouts"] += 1
+        return conn
+
+    def release(self, conn, broken=False):
+        if not broken:
+            try:
+                conn.rollback()
+            except self.errors:
+                broken = True
+        if broken:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.time()))
+
+    @contextmanager
+    def connection(self):
+        conn = self.checkout()
+        try:
+            yield conn
+        except self.errors:
+            self.release(conn, broken=not self._healthy(conn))
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def warm(self, count=1):
+        conns = [self.checkout() for _ in range(min(count, self.size))]
+        for conn in conns:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    @property
+    def in_use(self):
+        return self._created - self._idle.qsize()
+
+
+def connect_to_db():
+    if pyodbc is None:
+        raise ImportError("DB_BACKEND=mssql needs the pyodbc package (pip install pyodbc)")
+    conn_str = (
+        "DRIVER={ODBC Driver 13 for SQL Server};"
+        "SERVER=ZER0-TW0;"
+        "DATABASE=MonikaTracker;"
+        "Trusted_Connection=yes;"
+    )
+    try:
+        conn = pyodbc.connect(conn_str)
+        print("DB: Connected successfully!")
+        return conn
+    except pyodbc.Error as e:
+        print(f"DB ERROR: Connection failed - {e}")
+        raise
+
+
+def connect_to_sqlite():
+    conn = sqlite_backend.connect(os.getenv("SQLITE_PATH", "monika.db"))
+    print("DB: Connected to local SQLite database")
+    return conn
+
+
+DB_ERRORS = ((pyodbc.Error,) if pyodbc is not None else ()) + (sqlite_backend.Error,)
+
+
+# The pool for the configured backend; used by the app and by tools like the bulk import CLI that
+# shouldn't start the app's background threads
+def create_pool():
+    backend = os.getenv("DB_BACKEND", "mssql").lower()
+    return ConnectionPool(
+        connect_to_sqlite if backend == "sqlite" else connect_to_db,
+        size=int(os.getenv("DB_POOL_SIZE", "5")),
+        checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        errors=DB_ERRORS,
+    )
@@ -0,0 +1,77 @@
+import time
+import threading
+from collections import namedtuple
+
+FoodItem = namedtuple("FoodItem", ["food_id", "name", "calories", "protein", "carbs", "fat"])
+
+CATALOG_QUERY = ("SELECT FoodID, FoodName, TotalCalories, Protein, TotalCarbohydrates, TotalFat "
+                 "FROM FoodItems WHERE Active = 1 ORDER BY FoodID")
+
+
+def normalize_name(name):
+    return " ".join(name.split()).casefold()
+
+
+# In-memory copy of the active FoodItems rows. Loaded on first use through get_cursor, then served
+# from memory until invalidate() is called by the code that changes FoodItems (or max_age passes,
+# which covers edits made by another process). If a reload fails with one of errors, the last
+# copy keeps being served until the DB is back.
+class FoodCatalog:
+    def __init__(self, get_cursor, max_age=3600, errors=()):
+        self.get_cursor = get_cursor
+        self.max_age = max_age
+        self.errors = errors
+        self._items = None
+        self._by_name = {}
+        self._loaded_at = 0
+        self._mutex = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "unknown": 0, "stale": 0}
+
+    def _catalog(self):
+        with self._mutex:
+            if self._items is not None and time.time() - self._loaded_at < self.max_age:
+                self.stats["hits"] += 1
+                return self._items, self._by_name
+            self.stats["misses"] += 1
+        try:
+            cursor = self.get_cursor()
+            cursor.execute(CATALOG_QUERY)
+            items = [FoodItem(*row) for row in cursor.fetchall()]
+        except self.errors as e:
+            with self._mutex:
+                if self._items is None:
+                    raise
+                self.stats["stale"] += 1
+                print(f"FOOD CATALOG: reload failed, serving the last copy - {e}")
+                return self._items, self._by_name
+        by_name = {}
+        for item in items:
+            by_name.setdefault(normalize_name(item.name), item)
+        with self._mutex:
+            self._items, self._by_name, self._loaded_at = items, by_name, time.time()
+            self.stats["loads"] += 1
+        return items, by_name
+
+    def names(self):
+        items, _ = self._catalog()
+        return [item.name for item in items]
+
+    def lookup(self, name):
+        _, by_name = self._catalog()
+        item = by_name.get(normalize_name(name))
+        if item is None:
+            self.stats["unknown"] += 1
+        return item
+
+    def __len__(self):
+        items, _ = self._catalog()
+        return len(items)
+
+    def invalidate(self):
+        with self._mutex:
+            self._items = None
+            self._by_name = {}
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
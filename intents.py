@@ -0,0 +1,99 @@
+import re
+from collections import namedtuple
+
+Intent = namedtuple("Intent", ["name", "slots"])
+
+# Step-100 intents, highest priority first, each with one or more patterns matched anywhere in
+# the lowercased message. Named groups become the intent's slots. Flags are extra slots holding
+# the first occurrence of their pattern anywhere in the message.
+INTENT_TABLE = [
+    ("plan_query", [r"what do i eat for(?:\s+(?P<meal>\w+))?"]),
+    ("ate", [r"i ate(?:\s+(?P<meal>\w+))?"]),
+    ("exercise", [r"(?P<duration>\d+(?:\.\d+)?)\s*(?P<unit>laps|miles|minutes|min)"]),
+    ("slip", [r"fucked up", r"bacanator"]),
+    ("skip_meal", [r"didn[’']t eat(?:\s+(?P<meal>\w+))?", r"skip(?:ped)?(?:\s+(?P<meal>\w+))?"]),
+]
+INTENT_FLAGS = {"ate": [("plan", [r"plan", r"suggested"])]}
+
+EXERCISE_RE = re.compile(r"(?P<duration>\d+(?:\.\d+)?)\s*(?P<unit>laps|miles|minutes|min)", re.IGNORECASE)
+FOOD_QTY_RE = re.compile(r"(?P<qty>\d+)g\s+(?P<food>.+)", re.IGNORECASE)
+
+MEALS = ("breakfast", "snack", "lunch", "dinner")
+
+
+# The table compiled into one alternation, so a message is lowercased once and scanned in a
+# single left-to-right pass that collects every intent trigger and flag; the highest-priority
+# intent found wins. Each search resumes one character past the last match's start, not its end,
+# so a lower-priority match can't swallow a higher-priority trigger ("skip i ate lunch"). Each branch ends in an empty tag group (so match.lastgroup names it) rather than
+# being wrapped in one, which keeps the literal prefixes visible to re's first-character scan.
+# A flag takes precedence over a slot: one inside the winning match ("i ate plan") is looked for
+# there, and the slot it overlaps is cleared.
+class IntentRouter:
+    def __init__(self, table=INTENT_TABLE, flags=INTENT_FLAGS):
+        self.branches = {}
+        branches = []
+        for priority, (name, patterns) in enumerate(table):
+            for pattern in patterns:
+                branches.append(self._add_branch(pattern, (priority, name)))
+        self.flags = {}
+        self.flag_regexes = {}
+        for name, intent_flags in flags.items():
+            for flag, patterns in intent_flags:
+                self.flags.setdefault(name, []).append(flag)
+                self.flag_regexes[flag] = re.compile("|".join(patterns))
+                for pattern in patterns:
+                    branches.append(self._add_branch(pattern, (None, flag)))
+        self.regex = re.compile("|".join(branches))
+
+    def _add_branch(self, pattern, target):
+        tag = f"b{len(self.branches)}"
+        slots = [(slot, f"{tag}_{slot}") for slot in re.compile(pattern).groupindex]
+        self.branches[tag] = target + (slots,)
+        return re.sub(r"\(\?P<(\w+)>", lambda m: f"(?P<{tag}_{m.group(1)}>", pattern) + f"(?P<{tag}>)"
+
+    def route(self, message):
+        text = message.lower()
+        search, branches = self.regex.search, self.branches
+        best = best_match = found = None
+        pos = 0
+        while (match := search(text, pos)) is not None:
+            pos = match.start() + 1
+            branch = branches[match.lastgroup]
+            if branch[0] is None:
+                found = found or {}
+                found.setdefault(branch[1], match.group())
+            elif best is None or branch[0] < best[0]:
+                best, best_match = branch, match
+                if best[0] == 0 and best[1] not in self.flags:
+                    break
+        if best is None:
+            return Intent("fallback", {})
+        _, name, groups = best
+        slots = {slot: best_match.group(group) for slot, group in groups}
+        for flag in self.flags.get(name, ()):
+            slots[flag] = found.get(flag) if found else None
+            inner = self.flag_regexes[flag].search(text, best_match.start(), best_match.end())
+            if inner is not None:
+                slots[flag] = slots[flag] or inner.group()
+                for slot, group in groups:
+                    start, end = best_match.span(group)
+                    if start < inner.end() and inner.start() < end:
+                        slots[slot] = None
+        return Intent(name, slots)
+
+
+def parse_exercise(message):
+    match = EXERCISE_RE.search(message)
+    if not match:
+        return None
+    return float(match.group("duration")), match.group("unit").lower()
+
+
+def parse_food_qty(message):
+    match = FOOD_QTY_RE.match(message)
+    if not match:
+        return None
+    return match.group("qty"), match.group("food")
+
+
+router = IntentRouter()
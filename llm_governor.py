@@ -0,0 +1,256 @@
+import time
+import threading
+import contextvars
+from collections import deque
+
+import metrics
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+# Per-model circuit breaker: after failure_threshold failures in a row the model is skipped for
+# reset_after seconds, then one trial call is let through (half-open); its outcome closes or
+# reopens the circuit.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_after=30):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0
+        self._trial = False
+        self._mutex = threading.Lock()
+
+    def allow(self):
+        with self._mutex:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._mutex:
+            self.state, self.failures, self._trial = "closed", 0, False
+
+    def failure(self):
+        with self._mutex:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"LLM GOVERNOR: circuit opened after {self.failures} failures")
+                self.state, self.opened_at, self._trial = "open", time.monotonic(), False
+
+
+# One call's attempts (the first and, if hedged, a duplicate) racing for the same answer. The
+# first to finish wins; when streaming, the first to produce a token wins and is the only one
+# whose tokens reach on_token.
+class _Race:
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.winner = None
+        self.result = None
+        self.error = None
+        self.launched = 0
+        self.failed = 0
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self._mutex = threading.Lock()
+
+    def claim(self, attempt):
+        with self._mutex:
+            if self.winner is None:
+                self.winner = attempt
+                self.started.set()
+            return self.winner == attempt
+
+    def finish(self, attempt, result):
+        with self._mutex:
+            if self.result is None and self.winner in (None, attempt):
+                self.winner, self.result = attempt, result
+                self.started.set()
+                self.done.set()
+
+    def fail(self, attempt, error):
+        with self._mutex:
+            self.failed += 1
+            self.error = error
+            # Once a stream has started there's nothing to switch to
+            if self.winner == attempt or (self.winner is None and self.failed == self.launched):
+                self.started.set()
+                self.done.set()
+
+
+# Governs LLM calls: at most max_in_flight requests to the provider at once (callers queue for
+# up to queue_timeout), a deadline per call, a hedged duplicate request once the first has been
+# out longer than the recent p95 latency (if a slot is free), a circuit breaker per model, and a
+# fallback model, then the caller's canned reply, when the primary fails, times out or is open.
+# Streams are hedged and timed on their first token. create is client.chat.completions.create,
+# called with timeout=, so abandoned attempts are cut off by the HTTP client.
+class LLMGovernor:
+    def __init__(self, create, model, fallback_model=None, max_in_flight=8, queue_timeout=5, deadline=20,
+                 fallback_deadline=8, hedge=True, hedge_min=0.5, hedge_samples=20, failure_threshold=5,
+                 reset_after=30):
+        self.create = create
+        self.model = model
+        self.fallback_model = fallback_model
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.fallback_deadline = fallback_deadline
+        self.hedge = hedge
+        self.hedge_min = hedge_min
+        self.hedge_samples = hedge_samples
+        self.breakers = {m: CircuitBreaker(failure_threshold, reset_after) for m in (model, fallback_model) if m}
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._latencies = {}
+        self._mutex = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "errors": 0, "rejected": 0,
+                      "fallback_model": 0, "canned": 0}
+
+    def _observe(self, model, stream, seconds):
+        with self._mutex:
+            self._latencies.setdefault((model, stream), deque(maxlen=200)).append(seconds)
+
+    def hedge_delay(self, model, stream):
+        with self._mutex:
+            samples = sorted(self._latencies.get((model, stream), ()))
+        if len(samples) < self.hedge_samples:
+            return None
+        return max(samples[int(len(samples) * 0.95) - 1], self.hedge_min)
+
+    def _acquire(self, timeout=None):
+        # Without a timeout, only takes a slot that's free now
+        with self._mutex:
+            self.queued += timeout is not None
+        try:
+            acquired = self._slots.acquire(timeout=max(timeout, 0)) if timeout is not None else self._slots.acquire(False)
+        finally:
+            with self._mutex:
+                self.queued -= timeout is not None
+                self.in_flight += acquired
+        return acquired
+
+    def _release(self):
+        with self._mutex:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _attempt(self, race, attempt, model, messages, stream, timeout):
+        start = time.monotonic()
+        tokens, usage = [], None
+        try:
+            with metrics.span("llm_attempt", model, attempt=attempt):
+                if stream:
+                    response = self.create(model=model, messages=messages, stream=True, timeout=timeout,
+                                           stream_options={"include_usage": True})
+                    for chunk in response:
+                        token = chunk.choices[0].delta.content if chunk.choices else None
+                        if token:
+                            if not tokens:
+                                self._observe(model, True, time.monotonic() - start)
+                                if not race.claim(attempt):
+                                    response.close()
+                                    return
+                            tokens.append(token)
+                            race.on_token(token)
+                        usage = getattr(chunk, "usage", None) or usage
+                    result = ("".join(tokens), usage)
+                else:
+                    response = self.create(model=model, messages=messages, timeout=timeout)
+                    self._observe(model, False, time.monotonic() - start)
+                    result = (response.choices[0].message.content, response.usage)
+            race.finish(attempt, result)
+        except Exception as e:
+            if tokens:
+                # Cut off mid-stream: the user has already seen these tokens, so they're the reply
+                print(f"LLM GOVERNOR: {model} stream broke off - {e}")
+                race.finish(attempt, ("".join(tokens), usage))
+            else:
+                race.fail(attempt, e)
+        finally:
+            self._release()
+
+    def _launch(self, race, model, messages, stream, timeout):
+        race.launched += 1
+        context = contextvars.copy_context()
+        args = (self._attempt, race, race.launched, model, messages, stream, timeout)
+        threading.Thread(target=context.run, args=args, name="llm-attempt", daemon=True).start()
+
+    def _call(self, model, messages, stream, on_token, deadline):
+        # Returns (reply, usage) or raises LLMUnavailable; the caller holds one slot for the first attempt
+        race = _Race(on_token)
+        self._launch(race, model, messages, stream, deadline)
+        deadline_at = time.monotonic() + deadline
+        first_result = race.started if stream else race.done
+        delay = self.hedge_delay(model, stream) if self.hedge else None
+        if delay is not None and delay < deadline and not first_result.wait(delay):
+            if self._acquire():
+                self.stats["hedges"] += 1
+                self._launch(race, model, messages, stream, deadline_at - time.monotonic())
+        # Claiming the race for nobody keeps a late attempt from answering after we've moved on
+        if not first_result.wait(max(deadline_at - time.monotonic(), 0)) and race.claim(0):
+            self.stats["timeouts"] += 1
+            raise LLMUnavailable(f"{model} gave no answer within {deadline:.0f}s")
+        # A stream that has started is left to finish; its HTTP timeout bounds the gaps between chunks
+        race.done.wait()
+        if race.result is None:
+            self.stats["errors"] += 1
+            raise LLMUnavailable(f"{model} failed - {race.error}")
+        if race.winner > 1:
+            self.stats["hedge_wins"] += 1
+        return race.result
+
+    def _try(self, model, messages, stream, on_token, deadline):
+        breaker = self.breakers[model]
+        if not breaker.allow():
+            metrics.LLM_OUTCOMES.inc(1, model, "circuit_open")
+            return None
+        # Time spent queueing counts against the deadline
+        queued_at = time.monotonic()
+        if not self._acquire(min(self.queue_timeout, deadline)):
+            self.stats["rejected"] += 1
+            metrics.LLM_OUTCOMES.inc(1, model, "rejected")
+            return None
+        try:
+            result = self._call(model, messages, stream, on_token, deadline - (time.monotonic() - queued_at))
+        except LLMUnavailable as e:
+            breaker.failure()
+            metrics.LLM_OUTCOMES.inc(1, model, "failed")
+            print(f"LLM GOVERNOR: {e}")
+            return None
+        breaker.success()
+        metrics.LLM_OUTCOMES.inc(1, model, "ok")
+        return result
+
+    def complete(self, messages, stream=False, on_token=None, fallback=None):
+        # Returns (reply, usage, model); model is None for the canned fallback. With no fallback
+        # text, raises LLMUnavailable instead.
+        self.stats["calls"] += 1
+        on_token = on_token or (lambda token: None)
+        for model, deadline in ((self.model, self.deadline), (self.fallback_model, self.fallback_deadline)):
+            if not model:
+                continue
+            result = self._try(model, messages, stream, on_token, deadline)
+            if result is not None:
+                if model != self.model:
+                    self.stats["fallback_model"] += 1
+                return result[0], result[1], model
+        if fallback is None:
+            raise LLMUnavailable("No model available")
+        self.stats["canned"] += 1
+        on_token(fallback)
+        return fallback, None, None
+
+    def snapshot(self):
+        return dict(self.stats, in_flight=self.in_flight, queued=self.queued,
+                    hedge_after={f"{m}{' stream' if s else ''}": self.hedge_delay(m, s) for m, s in list(self._latencies)},
+                    circuits={m: b.state for m, b in self.breakers.items()})
@@ -0,0 +1,200 @@
+import re
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Spans and Prometheus-style metrics for the request path. span() times a block, nests under the
+# current span (tracked per request/thread in a contextvar) and feeds a histogram; the root span
+# of a request keeps the whole tree for the slow-request log. /metrics serves render().
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._mutex = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        with self._mutex:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._mutex:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', repr(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._mutex = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, *labels):
+        with self._mutex:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._mutex:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values)
+        return lines
+
+
+REGISTRY = []
+
+REQUEST_SECONDS = Histogram("monika_request_seconds", "HTTP request latency.", ("endpoint", "method", "status"))
+SPAN_SECONDS = Histogram("monika_span_seconds", "Time spent in instrumented blocks, by kind and name.",
+                         ("kind", "name"))
+LLM_TOKENS = Counter("monika_llm_tokens_total", "Tokens sent to and received from the LLM.", ("model", "type"))
+LLM_PROMPT_TOKENS = Histogram("monika_llm_prompt_tokens", "Prompt tokens per LLM call, by mode.", ("model", "mode"),
+                              buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000))
+LLM_OUTCOMES = Counter("monika_llm_outcomes_total", "Governed LLM calls by model and outcome.", ("model", "outcome"))
+STEP_TRANSITIONS = Counter("monika_step_transitions_total", "Conversation state changes made by each handler.",
+                           ("handler", "from_step", "to_step"))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class Span:
+    __slots__ = ("kind", "name", "attrs", "start", "duration", "children")
+
+    def __init__(self, kind, name, attrs):
+        self.kind = kind
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = None
+        self.children = []
+
+    def tree(self, indent=0):
+        attrs = "".join(f" {k}={v}" for k, v in self.attrs.items())
+        duration = f"{self.duration * 1000:.1f} ms" if self.duration is not None else "unfinished"
+        lines = [f"{'  ' * indent}{self.kind} {self.name} {duration}{attrs}"]
+        for child in list(self.children):
+            lines.extend(child.tree(indent + 1))
+        return lines
+
+
+_current = contextvars.ContextVar("monika_span", default=None)
+
+
+@contextmanager
+def span(kind, name, **attrs):
+    parent = _current.get()
+    current = Span(kind, name, attrs)
+    if parent is not None:
+        parent.children.append(current)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current.reset(token)
+        SPAN_SECONDS.observe(current.duration, kind, name)
+
+
+def start_request(name):
+    root = Span("request", name, {})
+    return root, _current.set(root)
+
+
+def finish_request(root, token, endpoint, method, status):
+    root.duration = time.perf_counter() - root.start
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Streamed responses finish in a different context than the one they started in
+        _current.set(None)
+    REQUEST_SECONDS.observe(root.duration, endpoint, method, status)
+    return root.duration
+
+
+def current_span():
+    return _current.get()
+
+
+_STATEMENT_LABELS = {}
+_EXEC_RE = re.compile(r"\bEXEC\s+(\w+)", re.IGNORECASE)
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\[?(\w+)", re.IGNORECASE)
+
+
+def statement_label(sql):
+    # Low-cardinality name for a statement: the procedure for EXECs, else the verb and first table
+    label = _STATEMENT_LABELS.get(sql)
+    if label is None:
+        match = _EXEC_RE.search(sql)
+        if match:
+            label = f"EXEC {match.group(1)}"
+        else:
+            table = _TABLE_RE.search(sql)
+            label = sql.split(None, 1)[0].upper() + (f" {table.group(1)}" if table else "")
+        if len(_STATEMENT_LABELS) < 1024:
+            _STATEMENT_LABELS[sql] = label
+    return label
+
+
+# Cursor wrapper that puts a "db" span around each execute/executemany
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def execute(self, sql, *params):
+        with span("db", statement_label(sql)):
+            self._cursor.execute(sql, *params)
+        return self
+
+    def executemany(self, sql, params):
+        with span("db", statement_label(sql), rows=len(params)):
+            self._cursor.executemany(sql, params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
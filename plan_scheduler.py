@@ -0,0 +1,135 @@
+import datetime
+import threading
+from collections import OrderedDict, defaultdict
+
+
+def _weight(profile):
+    return round(float(profile.get("CurrentWeight") or 0), 1)
+
+
+# Daily plans (baseline, deficit, GenerateDailyPlan rows and Monika's plan message), memoized per
+# (date, weight) and precomputed on a background thread so the first fitness interaction of the
+# day is served from memory. GenerateDailyPlan always plans for the DB's today, so a day's plan is
+# computed shortly after midnight, and again whenever its inputs change: the morning weigh-in
+# (new weight, new key) or a log for the day before (its burn/intake feed the deficit). Logs are
+# counted per day, and a plan built before a log for its previous day is treated as stale.
+class PlanScheduler:
+    def __init__(self, compute, run_at=datetime.time(0, 5), settle=1.0, max_plans=8):
+        self.compute = compute
+        self.run_at = run_at
+        self.settle = settle
+        self.max_plans = max_plans
+        self.profile = None
+        self._plans = OrderedDict()
+        self._log_versions = defaultdict(int)
+        self._requested = False
+        self._in_flight = {}
+        self._mutex = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"hits": 0, "misses": 0, "precomputed": 0, "stale": 0, "failures": 0}
+
+    def _version(self, day):
+        return self._log_versions[day - datetime.timedelta(days=1)]
+
+    def _lookup(self, day, profile):
+        entry = self._plans.get((day, _weight(profile)))
+        if entry is not None and entry[0] != self._version(day):
+            self.stats["stale"] += 1
+            return None
+        return entry[1] if entry else None
+
+    def get(self, day, profile, wait=0):
+        # With wait, a precompute already running for this key is given that long to finish
+        with self._mutex:
+            done = self._in_flight.get((day, _weight(profile)))
+        if done is not None and wait:
+            done.wait(wait)
+        with self._mutex:
+            plan = self._lookup(day, profile)
+            self.stats["hits" if plan else "misses"] += 1
+            return plan
+
+    def version(self, day):
+        with self._mutex:
+            return self._version(day)
+
+    def put(self, day, profile, plan, version):
+        with self._mutex:
+            self._plans[(day, _weight(profile))] = (version, plan)
+            self._plans.move_to_end((day, _weight(profile)))
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+    def invalidate(self):
+        with self._mutex:
+            self._plans.clear()
+
+    def remember(self, profile):
+        with self._mutex:
+            self.profile = dict(profile)
+
+    def notify_log(self, day):
+        if isinstance(day, datetime.datetime):
+            day = day.date()
+        elif not isinstance(day, datetime.date):
+            day = datetime.date.fromisoformat(str(day)[:10])
+        with self._mutex:
+            self._log_versions[day] += 1
+        if day == datetime.date.today() - datetime.timedelta(days=1):
+            self.request()
+
+    def request(self):
+        # Recompute today's plan soon (after settle seconds, so a burst of logs costs one compute)
+        self._requested = True
+        self._wake.set()
+
+    def _seconds_until_run(self):
+        now = datetime.datetime.now()
+        run = datetime.datetime.combine(now.date(), self.run_at)
+        if run <= now:
+            run += datetime.timedelta(days=1)
+        return (run - now).total_seconds()
+
+    def precompute(self):
+        day = datetime.date.today()
+        with self._mutex:
+            profile = self.profile
+            if profile is None or not all(profile.get(k) for k in ("CurrentWeight", "HeightCm", "AgeYears")):
+                return None
+            if self._lookup(day, profile) is not None:
+                return None
+            key, version = (day, _weight(profile)), self._version(day)
+            done = self._in_flight[key] = threading.Event()
+        try:
+            plan = self.compute(day, profile)
+            if plan is not None:
+                self.put(day, profile, plan, version)
+                self.stats["precomputed"] += 1
+            return plan
+        finally:
+            with self._mutex:
+                del self._in_flight[key]
+            done.set()
+
+    def _run(self):
+        while True:
+            if not self._wake.wait(self._seconds_until_run()):
+                self._requested = True
+            self._wake.clear()
+            if not self._requested:
+                continue
+            while self._wake.wait(self.settle):
+                self._wake.clear()
+            self._requested = False
+            try:
+                self.precompute()
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"PLAN ERROR: precompute failed - {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="plan-scheduler", daemon=True)
+            self._thread.start()
@@ -0,0 +1,84 @@
+import re
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt.strip().lower())
+
+
+def fingerprint(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+# Cache of LLM replies for templated prompts, keyed on (mode, normalized prompt, context
+# fingerprint). A key serves hits from its first stored reply; until it holds `variants` different
+# replies, a `sample` fraction of its lookups still miss so the LLM adds another one, and hits
+# rotate through them so Monika doesn't repeat herself word for word. Entries expire ttl seconds
+# after their first reply; beyond max_keys the least recently used key is dropped.
+class ResponseCache:
+    def __init__(self, ttl=3600, max_keys=512, variants=3, sample=0.25):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.variants = variants
+        self.sample = sample
+        self._entries = OrderedDict()
+        self._mutex = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "sampled": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def key(self, mode, prompt, *context):
+        return (mode, normalize_prompt(prompt), fingerprint(*context))
+
+    def get(self, key):
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() >= entry["expires"]:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None or not entry["replies"]:
+                self.stats["misses"] += 1
+                return None
+            if len(entry["replies"]) < self.variants and random.random() < self.sample:
+                self.stats["misses"] += 1
+                self.stats["sampled"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            choices = [i for i in range(len(entry["replies"])) if i != entry["last"]]
+            entry["last"] = random.choice(choices) if choices else 0
+            return entry["replies"][entry["last"]]
+
+    def put(self, key, reply):
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {"replies": [], "last": -1, "expires": time.time() + self.ttl}
+            if reply not in entry["replies"] and len(entry["replies"]) < self.variants:
+                entry["replies"].append(reply)
+                self.stats["stores"] += 1
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._mutex:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def snapshot(self):
+        return dict(self.stats, keys=len(self._entries), hit_rate=round(self.hit_rate(), 4))
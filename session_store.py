@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import decimal
+import datetime
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def default_state():
+    return {"progress": 0.5, "trend_data": {}, "happy": False, "sad": False, "typing": False}
+
+
+# One user's conversation. Slots keep per-session overhead small when many are held in memory;
+# item access is kept so the handlers can keep using session_state["..."].
+class Session:
+    __slots__ = (
+        "sid", "messages", "setup_step", "setup_data", "setup_prompts", "daily_prompts", "mode",
+        "daily_plan", "meals_logged_today", "state", "waiting_for_input", "next_message_id",
+        "db_context", "memory", "last_access",
+    )
+    FIELDS = __slots__[1:-1]
+
+    def __init__(self, sid):
+        self.sid = sid
+        self.messages = []
+        self.setup_step = 0
+        self.setup_data = {"ActivityLevel": "SomewhatActive"}
+        self.setup_prompts = []
+        self.daily_prompts = []
+        self.mode = "fitness"  # Default mode
+        self.daily_plan = None
+        self.meals_logged_today = []
+        self.state = default_state()
+        self.waiting_for_input = False
+        self.next_message_id = 1
+        self.db_context = None
+        self.memory = {"summary": "", "through": 0}  # see conversation_memory
+        self.last_access = time.time()
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.FIELDS else default
+
+    # Messages carry an increasing id so clients can ask only for what they haven't seen yet
+    def append_message(self, role, content):
+        msg = {"id": self.next_message_id, "role": role, "content": content}
+        self.next_message_id += 1
+        self.messages.append(msg)
+        return msg
+
+    def messages_since(self, cursor):
+        start = bisect.bisect_right(self.messages, cursor, key=lambda m: m.get("id", 0))
+        return self.messages[start:]
+
+    @property
+    def last_message_id(self):
+        return self.next_message_id - 1
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, sid, data):
+        session = cls(sid)
+        for field in cls.FIELDS:
+            if field in data:
+                setattr(session, field, data[field])
+        return session
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Can't store {type(value).__name__} in a session")
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+# In-process backend: an LRU of live Session objects. Sessions idle longer than idle_timeout,
+# or beyond max_sessions (least recently used first), are dropped.
+class MemorySessionStore:
+    def __init__(self, max_sessions=1000, idle_timeout=3600):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._locks = {}
+        self._mutex = threading.Lock()
+
+    def get(self, sid):
+        now = time.time()
+        with self._mutex:
+            session = self._sessions.get(sid)
+            if session is None or now - session.last_access > self.idle_timeout:
+                session = Session(sid)
+                self._sessions[sid] = session
+            self._sessions.move_to_end(sid)
+            session.last_access = now
+            self._evict(now)
+            return session
+
+    def save(self, sid, session):
+        with self._mutex:
+            session.last_access = time.time()
+            self._sessions[sid] = session
+            self._sessions.move_to_end(sid)
+
+    def delete(self, sid):
+        with self._mutex:
+            self._sessions.pop(sid, None)
+            self._drop_lock(sid)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now):
+        while self._sessions:
+            sid, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_access <= self.idle_timeout:
+                break
+            del self._sessions[sid]
+            self._drop_lock(sid)
+
+    def _drop_lock(self, sid):
+        # Called under _mutex. A lock is only dropped once no request holds or is waiting for it;
+        # otherwise the next request would make a second lock for the same session.
+        entry = self._locks.get(sid)
+        if entry is not None and entry[1] == 0:
+            del self._locks[sid]
+
+    @contextmanager
+    def lock(self, sid):
+        # _locks maps sid -> [lock, number of requests holding or waiting for it]
+        with self._mutex:
+            entry = self._locks.setdefault(sid, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._mutex:
+                entry[1] -= 1
+                if sid not in self._sessions:
+                    self._drop_lock(sid)
+
+
+# Shared backend for multiple worker processes. Sessions are stored as JSON under a key with a
+# sliding TTL, so idle ones expire (configure Redis with maxmemory-policy allkeys-lru to also
+# evict by recency). Anything with the redis-py get/set/delete interface works as the client.
+class RedisSessionStore:
+    def __init__(self, client, prefix="monika:session:", idle_timeout=3600, lock_timeout=30):
+        self.client = client
+        self.prefix = prefix
+        self.idle_timeout = idle_timeout
+        self.lock_timeout = lock_timeout
+
+    def _key(self, sid):
+        return f"{self.prefix}{sid}"
+
+    def get(self, sid):
+        raw = self.client.get(self._key(sid))
+        if raw is None:
+            return Session(sid)
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return Session.from_dict(sid, json.loads(raw))
+
+    def save(self, sid, session):
+        session.last_access = time.time()
+        payload = json.dumps(session.to_dict(), default=_json_default)
+        self.client.set(self._key(sid), payload, ex=self.idle_timeout)
+
+    def delete(self, sid):
+        self.client.delete(self._key(sid))
+
+    @contextmanager
+    def lock(self, sid):
+        key = f"{self._key(sid)}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.time() + self.lock_timeout
+        while not self.client.set(key, token, nx=True, px=self.lock_timeout * 1000):
+            if time.time() > deadline:
+                raise TimeoutError(f"Session {sid} is busy")
+            time.sleep(0.01)
+        # A request can outlast lock_timeout (several governed LLM calls), so the lock is renewed
+        # while it's held; lock_timeout only bounds how long a crashed worker's lock lingers
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep_alive, args=(key, token, done), name="session-lock", daemon=True)
+        keeper.start()
+        try:
+            yield
+        finally:
+            done.set()
+            keeper.join()
+            if self._holder(key) == token:
+                self.client.delete(key)
+
+    def _holder(self, key):
+        held = self.client.get(key)
+        return held.decode("utf-8") if isinstance(held, bytes) else held
+
+    def _keep_alive(self, key, token, done):
+        while not done.wait(self.lock_timeout / 3):
+            try:
+                if self._holder(key) != token:
+                    print(f"SESSION ERROR: lost the lock {key}")
+                    return
+                self.client.pexpire(key, int(self.lock_timeout * 1000))
+            except Exception as e:
+                print(f"SESSION ERROR: couldn't renew the lock {key} - {e}")
+
+
+# Local stand-in for a Redis server, enough of the redis-py surface for RedisSessionStore.
+class FakeRedis:
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._mutex = threading.Lock()
+
+    def _alive(self, name):
+        expires = self._expiry.get(name)
+        if expires is not None and time.time() >= expires:
+            self._data.pop(name, None)
+            self._expiry.pop(name, None)
+        return name in self._data
+
+    def get(self, name):
+        with self._mutex:
+            return self._data[name] if self._alive(name) else None
+
+    def set(self, name, value, ex=None, px=None, nx=False):
+        with self._mutex:
+            if nx and self._alive(name):
+                return None
+            self._data[name] = value.encode("utf-8") if isinstance(value, str) else value
+            if ex is not None:
+                self._expiry[name] = time.time() + ex
+            elif px is not None:
+                self._expiry[name] = time.time() + px / 1000
+            else:
+                self._expiry.pop(name, None)
+            return True
+
+    def pexpire(self, name, milliseconds):
+        with self._mutex:
+            if not self._alive(name):
+                return False
+            self._expiry[name] = time.time() + milliseconds / 1000
+            return True
+
+    def delete(self, *names):
+        with self._mutex:
+            removed = 0
+            for name in names:
+                if self._alive(name):
+                    removed += 1
+                self._data.pop(name, None)
+                self._expiry.pop(name, None)
+            return removed
+
+
+def create_session_store():
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    idle_timeout = int(os.getenv("SESSION_IDLE_SECONDS", "3600"))
+    if backend == "redis":
+        if redis is None:
+            raise ImportError("SESSION_BACKEND=redis needs the redis package (pip install redis)")
+        client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        return RedisSessionStore(client, idle_timeout=idle_timeout)
+    if backend == "fakeredis":
+        return RedisSessionStore(FakeRedis(), idle_timeout=idle_timeout)
+    return MemorySessionStore(max_sessions=int(os.getenv("SESSION_MAX", "1000")), idle_timeout=idle_timeout)
@@ -0,0 +1,346 @@
+import re
+import uuid
+import sqlite3
+import decimal
+import datetime
+
+# Local stand-in for the MonikaTracker SQL Server database: the same tables plus Python versions
+# of the stored procedures, behind a pyodbc-style connection/cursor. The T-SQL the app sends
+# (EXEC ..., DECLARE/OUTPUT, TOP n, ISNULL) is translated on the way in, so app.py runs
+# unchanged against it for local development and load tests.
+
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(decimal.Decimal, float)
+
+Error = sqlite3.Error
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS LookupValues (
+    LookupID INTEGER PRIMARY KEY AUTOINCREMENT,
+    GroupName TEXT NOT NULL,
+    LookupValue TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS AppSettings (
+    SettingID INTEGER PRIMARY KEY CHECK (SettingID = 1),
+    CurrentWeight REAL,
+    HeightCm REAL,
+    AgeYears REAL,
+    SetupComplete INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS Goals (
+    GoalID INTEGER PRIMARY KEY AUTOINCREMENT,
+    GoalType TEXT NOT NULL,
+    GoalDescription TEXT,
+    StartWeight REAL,
+    TargetWeight REAL,
+    TargetDate TEXT,
+    Active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS FoodItems (
+    FoodID INTEGER PRIMARY KEY AUTOINCREMENT,
+    FoodName TEXT NOT NULL COLLATE NOCASE,
+    TotalCalories REAL,
+    Protein REAL,
+    TotalCarbohydrates REAL,
+    TotalFat REAL,
+    Active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS Exercise (
+    ExerciseID INTEGER PRIMARY KEY AUTOINCREMENT,
+    [Date] TEXT NOT NULL,
+    ExerciseTypeID INTEGER REFERENCES LookupValues (LookupID),
+    ExerciseType TEXT NOT NULL COLLATE NOCASE,
+    DurationMinutes REAL,
+    CalorieBurn INTEGER
+);
+CREATE INDEX IF NOT EXISTS IX_Exercise_Date ON Exercise ([Date]);
+CREATE VIEW IF NOT EXISTS DailyExerciseTotals AS
+    SELECT [Date], SUM(DurationMinutes) AS DurationMinutes, SUM(CalorieBurn) AS CalorieBurn
+    FROM Exercise GROUP BY [Date];
+CREATE TABLE IF NOT EXISTS ProgressLog (
+    LogID INTEGER PRIMARY KEY AUTOINCREMENT,
+    LogDate TEXT,
+    Laps REAL,
+    CaloriesBurned INTEGER,
+    Weight REAL,
+    LogTimestamp TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS WeightLog (
+    WeightLogID INTEGER PRIMARY KEY AUTOINCREMENT,
+    [Date] TEXT NOT NULL,
+    RecordedWeight REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ActualMeals (
+    ActualMealID INTEGER PRIMARY KEY AUTOINCREMENT,
+    [Date] TEXT NOT NULL,
+    FoodID INTEGER REFERENCES FoodItems (FoodID),
+    Description TEXT,
+    Quantity REAL,
+    TotalCalories REAL,
+    MealName TEXT COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS IX_ActualMeals_Date ON ActualMeals ([Date]);
+CREATE TABLE IF NOT EXISTS Deviations (
+    DeviationID INTEGER PRIMARY KEY AUTOINCREMENT,
+    [Date] TEXT NOT NULL,
+    Reason TEXT
+);
+"""
+
+SEED = [
+    ("INSERT INTO LookupValues (GroupName, LookupValue) SELECT 'ExerciseTypes', 'Laps' "
+     "WHERE NOT EXISTS (SELECT 1 FROM LookupValues WHERE GroupName = 'ExerciseTypes' AND LookupValue = 'Laps')", ()),
+    ("INSERT INTO LookupValues (GroupName, LookupValue) SELECT 'ExerciseTypes', 'Walking' "
+     "WHERE NOT EXISTS (SELECT 1 FROM LookupValues WHERE GroupName = 'ExerciseTypes' AND LookupValue = 'Walking')", ()),
+]
+
+SETUP_PROMPTS = [
+    (1, "Hi, babe! Let’s get you set up. What’s your starting weight in lbs?", "StartWeight"),
+    (2, "What weight are we aiming for, love?", "TargetWeight"),
+    (3, "When do you want to hit it? Give me a date like 2025-12-31.", "TargetDate"),
+    (4, "How tall are you in cm?", "HeightCm"),
+    (5, "And how old are you, sweetie?", "AgeYears"),
+]
+
+DAILY_MEALS = [("Breakfast", 0.25), ("Snack", 0.10), ("Lunch", 0.30), ("Snack", 0.10), ("Dinner", 0.25)]
+
+ACTIVITY_FACTORS = {"Sedentary": 1.2, "SomewhatActive": 1.375, "Active": 1.55, "VeryActive": 1.725}
+
+
+def _today():
+    return datetime.date.today().isoformat()
+
+
+def _yesterday():
+    return (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+
+
+def _scalar(db, sql, params=()):
+    row = db.execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+# Stored procedures. Each takes the raw sqlite3 connection and the named arguments, and returns
+# the rows of its result set (or the OUTPUT value for the DECLARE ... OUTPUT form).
+def initialize_app_setup(db):
+    if _scalar(db, "SELECT SetupComplete FROM AppSettings WHERE SettingID = 1"):
+        return []
+    return list(SETUP_PROMPTS)
+
+
+def complete_app_setup(db, StartWeight, TargetWeight, TargetDate, CurrentWeight, HeightCm, AgeYears):
+    db.execute("INSERT OR REPLACE INTO AppSettings (SettingID, CurrentWeight, HeightCm, AgeYears, SetupComplete) "
+               "VALUES (1, ?, ?, ?, 1)", (CurrentWeight, HeightCm, AgeYears))
+    if not _scalar(db, "SELECT COUNT(*) FROM Goals WHERE GoalType = 'LongTerm' AND Active = 1"):
+        db.execute("INSERT INTO Goals (GoalType, GoalDescription, StartWeight, TargetWeight, TargetDate, Active) "
+                   "VALUES ('LongTerm', ?, ?, ?, ?, 1)",
+                   (f"Get from {StartWeight} to {TargetWeight} lbs", StartWeight, TargetWeight, TargetDate))
+    return []
+
+
+def daily_startup_check(db):
+    prompts = []
+    if not _scalar(db, "SELECT COUNT(*) FROM WeightLog WHERE [Date] = ?", (_today(),)):
+        prompts.append((1, "Morning, babe! What’s your weight today?", "CurrentWeight"))
+    if not _scalar(db, "SELECT COUNT(*) FROM Exercise WHERE [Date] = ?", (_yesterday(),)):
+        prompts.append((2, "Did you get any exercise in yesterday? Say 'no' or like '12 laps'.", "YesterdayExercise"))
+    if not _scalar(db, "SELECT COUNT(*) FROM ActualMeals WHERE [Date] = ?", (_yesterday(),)):
+        for i, meal in enumerate(["Breakfast", "Snack1", "Lunch", "Snack2", "Dinner"], start=3):
+            prompts.append((i, f"What did you have for {meal} yesterday? Like '100g Ribeye' or 'nothing'.", meal))
+    return prompts
+
+
+def calculate_baseline_calories(db, CurrentWeight, HeightCm, AgeYears, ActivityLevel):
+    weight_kg = float(CurrentWeight) * 0.453592
+    bmr = 10 * weight_kg + 6.25 * float(HeightCm) - 5 * float(AgeYears) + 5
+    return int(round(bmr * ACTIVITY_FACTORS.get(ActivityLevel, 1.375)))
+
+
+def calculate_daily_deficit(db, CurrentWeight, YesterdayBurn, YesterdayIntake):
+    target = _scalar(db, "SELECT TargetWeight FROM Goals WHERE GoalType = 'LongTerm' AND Active = 1")
+    if target is not None and float(CurrentWeight) <= float(target):
+        return 0
+    deficit = 500 + max(0.0, float(YesterdayIntake) - 2000) / 2 - float(YesterdayBurn) / 4
+    return int(min(1000, max(250, deficit)))
+
+
+def generate_daily_plan(db):
+    settings = db.execute("SELECT CurrentWeight, HeightCm, AgeYears FROM AppSettings WHERE SettingID = 1").fetchone()
+    foods = db.execute("SELECT FoodName, TotalCalories FROM FoodItems WHERE Active = 1 AND TotalCalories > 0 "
+                       "ORDER BY FoodID").fetchall()
+    if not settings or not foods:
+        return []
+    baseline = calculate_baseline_calories(db, settings[0], settings[1], settings[2], "SomewhatActive")
+    burn = _scalar(db, "SELECT IFNULL(SUM(CalorieBurn), 0) FROM DailyExerciseTotals WHERE [Date] = ?", (_yesterday(),))
+    intake = _scalar(db, "SELECT IFNULL(SUM(TotalCalories), 0) FROM ActualMeals WHERE [Date] = ?", (_yesterday(),))
+    allowance = baseline - calculate_daily_deficit(db, settings[0], burn, intake)
+    rows = []
+    for i, (meal, share) in enumerate(DAILY_MEALS):
+        food, cal_per_100g = foods[i % len(foods)]
+        calories = int(round(allowance * share))
+        grams = int(round(calories / cal_per_100g * 100))
+        rows.append((float(allowance), meal, food, grams, calories, 0))
+    return rows
+
+
+def submit_exercise(db, ExerciseType, DurationMinutes, CalorieBurn):
+    if CalorieBurn is None:
+        CalorieBurn = int(round(float(DurationMinutes or 0) * 4))
+    type_id = _scalar(db, "SELECT LookupID FROM LookupValues WHERE GroupName = 'ExerciseTypes' AND LookupValue = ?",
+                      (ExerciseType,))
+    db.execute("INSERT INTO Exercise ([Date], ExerciseTypeID, ExerciseType, DurationMinutes, CalorieBurn) "
+               "VALUES (?, ?, ?, ?, ?)", (_today(), type_id, ExerciseType, DurationMinutes, CalorieBurn))
+    return [(_today(), CalorieBurn)]
+
+
+def log_actual(db, Date, FoodID, Description, Quantity, TotalCalories, MealName):
+    db.execute("INSERT INTO ActualMeals ([Date], FoodID, Description, Quantity, TotalCalories, MealName) "
+               "VALUES (?, ?, ?, ?, ?, ?)", (Date, FoodID, Description, Quantity, TotalCalories, MealName))
+    return []
+
+
+def log_deviation(db, Date, Reason):
+    db.execute("INSERT INTO Deviations ([Date], Reason) VALUES (?, ?)", (Date, Reason))
+    return []
+
+
+def update_food_preferences(db, FoodPreferences):
+    for pref in filter(None, FoodPreferences.split(",")):
+        food_id, active = pref.split(":")
+        db.execute("UPDATE FoodItems SET Active = ? WHERE FoodID = ?", (int(active), int(food_id)))
+    return []
+
+
+PROCEDURES = {
+    "InitializeAppSetup": initialize_app_setup,
+    "CompleteAppSetup": complete_app_setup,
+    "DailyStartupCheck": daily_startup_check,
+    "CalculateBaselineCalories": calculate_baseline_calories,
+    "CalculateDailyDeficit": calculate_daily_deficit,
+    "GenerateDailyPlan": generate_daily_plan,
+    "SubmitExercise": submit_exercise,
+    "LogActual": log_actual,
+    "LogDeviation": log_deviation,
+    "UpdateFoodPreferences": update_food_preferences,
+}
+
+EXEC_RE = re.compile(r"^\s*EXEC\s+(\w+)\s*(.*?)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+OUTPUT_RE = re.compile(r"^\s*DECLARE\s+@\w+\s+\w+\s*;\s*(EXEC\s+.*?)\s*;\s*SELECT\s+@\w+\s*;?\s*$",
+                       re.IGNORECASE | re.DOTALL)
+ARG_RE = re.compile(r"@(\w+)\s*=\s*(\?|@\w+\s+OUTPUT)", re.IGNORECASE)
+TOP_RE = re.compile(r"^(\s*SELECT\s+)TOP\s+(\d+)\s+(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+def translate(sql):
+    sql = re.sub(r"\bISNULL\s*\(", "IFNULL(", sql, flags=re.IGNORECASE)
+    top = TOP_RE.match(sql)
+    if top:
+        sql = f"{top.group(1)}{top.group(3).rstrip().rstrip(';')} LIMIT {top.group(2)}"
+    return sql
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.fast_executemany = False
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+        self._pending = []
+
+    def _call(self, name, arg_sql, params):
+        proc = PROCEDURES.get(name)
+        if proc is None:
+            raise sqlite3.OperationalError(f"Could not find stored procedure '{name}'")
+        params = list(params)
+        kwargs = {}
+        for arg, value in ARG_RE.findall(arg_sql):
+            if value == "?":
+                kwargs[arg] = params.pop(0)
+        return proc(self.connection.db, **kwargs)
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (tuple, list)):
+            params = params[0]
+        output = OUTPUT_RE.match(sql)
+        call = EXEC_RE.match(output.group(1) if output else sql)
+        self._pending = []
+        if call:
+            result = self._call(call.group(1), call.group(2), params)
+            self._rows = [(result,)] if output else [tuple(r) for r in result]
+            self.description = [("Result",)] if self._rows else None
+            self.rowcount = len(self._rows)
+        else:
+            # A batch of statements yields one result set each, read in turn through nextset()
+            results = []
+            params = list(params)
+            for statement in filter(str.strip, sql.split(";")):
+                count = statement.count("?")
+                cur = self.connection.db.execute(translate(statement), tuple(params[:count]))
+                params = params[count:]
+                rows = cur.fetchall() if cur.description else []
+                results.append((cur.description, rows, len(rows) if cur.description else cur.rowcount))
+            self.description, self._rows, self.rowcount = results[0] if results else (None, [], -1)
+            self._pending = results[1:]
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        total = 0
+        for params in seq_of_params:
+            self.execute(sql, tuple(params))
+            total += max(self.rowcount, 0)
+        self.rowcount = total
+        return self
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def nextset(self):
+        if not self._pending:
+            return None
+        self.description, self._rows, self.rowcount = self._pending.pop(0)
+        return True
+
+    def close(self):
+        self._rows = []
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+
+
+_MEMORY_DBS = {}
+
+
+def connect(path="monika.db"):
+    # ":memory:" gets a named shared-cache database so every pooled connection sees the same data
+    if path == ":memory:":
+        path = _MEMORY_DBS.setdefault(path, f"file:monika-{uuid.uuid4().hex}?mode=memory&cache=shared")
+    db = sqlite3.connect(path, uri=path.startswith("file:"), check_same_thread=False, timeout=30)
+    db.executescript(SCHEMA)
+    for sql, params in SEED:
+        db.execute(sql, params)
+    db.commit()
+    return Connection(db)
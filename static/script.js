@@ -1,5 +1,20 @@
+// Id of the newest message on screen; sent as "since" so the server only returns newer ones
+var lastMessageId = null;
+// Id of the oldest message on screen while there's older history to load, else null
+var historyBefore = null;
+var loadingHistory = false;
+
 $(document).ready(function() {
     console.log('jQuery loaded and ready');
+    var cursor = $('#messages').data('cursor');
+    if (cursor !== undefined) lastMessageId = parseInt(cursor, 10);
+    var before = $('#messages').data('history-before');
+    if (before !== undefined && before !== '' && before !== 'None') historyBefore = parseInt(before, 10);
+
+    $('#messages').on('scroll', function() {
+        if (this.scrollTop < 80) loadHistory();
+    });
+
     $('#chat-form').submit(function(e) {
         console.log('Form submit triggered');
         e.preventDefault();
@@ -7,15 +22,19 @@ $(document).ready(function() {
         if (!message) return;
 
         console.log('Sending:', message);
+        $('#message').val('');
+        if (window.fetch && window.ReadableStream && window.TextDecoder) {
+            streamChat(message);
+            return;
+        }
         $.ajax({
             url: '/send',
             type: 'POST',
-            data: { message: message },
+            data: withCursor({ message: message }),
             dataType: 'json',
             success: function(data) {
                 console.log('Response:', data);
-                updateChat(data.messages, data.state);
-                $('#message').val('');
+                updateChat(data);
             },
             error: function(xhr) {
                 console.error('Error:', xhr.responseText);
@@ -23,38 +42,174 @@ $(document).ready(function() {
         });
     });
 
-    function updateChat(messages, state) {
-        $('#messages').empty();
-        messages.forEach(function(msg) {
-            $('#messages').append(
-                `<div class="chat-message ${msg.role}">${msg.content}</div>`
-            );
+    $('#messages').scrollTop($('#messages')[0].scrollHeight);
+    $.getJSON('/trends', function(data) {
+        updateState(data.state);
+    });
+});
+
+function withCursor(data) {
+    if (lastMessageId !== null) data.since = lastMessageId;
+    return data;
+}
+
+// New entries go above the typing indicator and mood bar
+function placeInChat($el) {
+    var $anchor = $('#messages .typing-indicator, #messages .mood-bar').first();
+    if ($anchor.length) $el.insertBefore($anchor); else $('#messages').append($el);
+}
+
+function appendMessage(msg) {
+    if (msg.id !== undefined && lastMessageId !== null && msg.id <= lastMessageId) return;
+    placeInChat($('<div>').addClass('chat-message ' + msg.role).attr('data-id', msg.id).text(msg.content));
+    if (msg.id !== undefined) lastMessageId = msg.id;
+}
+
+// Infinite scroll: prepends the page before the oldest message, keeping the view where it was
+function loadHistory() {
+    if (historyBefore === null || loadingHistory) return;
+    loadingHistory = true;
+    $.getJSON('/history', { before: historyBefore }, function(data) {
+        var $box = $('#messages');
+        var height = $box[0].scrollHeight;
+        var $page = $();
+        data.messages.forEach(function(msg) {
+            $page = $page.add($('<div>').addClass('chat-message ' + msg.role).attr('data-id', msg.id).text(msg.content));
         });
-        if (state.typing) {
-            $('#messages').append('<div class="typing-indicator">Monika is typing...</div>');
+        var $first = $box.children('.chat-message, .chat-event').first();
+        if ($first.length) $page.insertBefore($first); else $box.prepend($page);
+        $box.scrollTop($box.scrollTop() + $box[0].scrollHeight - height);
+        historyBefore = data.has_more ? data.before : null;
+    }).always(function() {
+        loadingHistory = false;
+    });
+}
+
+function updateState(state) {
+    if (!state) return;
+    $('#messages .typing-indicator').remove();
+    if (state.typing) {
+        placeInChat($('<div class="typing-indicator">Monika is typing...</div>'));
+    }
+    var $bar = $('#messages .mood-bar');
+    if (!$bar.length) {
+        $bar = $('<div class="mood-bar"><div class="mood-progress"></div></div>');
+        $('#messages').append($bar);
+    }
+    $bar.find('.mood-progress').css('width', `${state.progress * 100}%`);
+}
+
+// Applies a delta response: appends only the new messages, or rebuilds when the server says reset
+function updateChat(data) {
+    if (data.reset) {
+        $('#messages .chat-message, #messages .chat-event').remove();
+        lastMessageId = null;
+        historyBefore = data.messages.length && data.messages[0].id > 1 ? data.messages[0].id : null;
+    }
+    data.messages.forEach(appendMessage);
+    lastMessageId = data.cursor;
+    updateState(data.state);
+    $('#messages').scrollTop($('#messages')[0].scrollHeight);
+}
+
+// Streaming replies: POST to /send/stream and read the Server-Sent Events off the response body
+function streamChat(message) {
+    var live = null;
+
+    function appendNote(text) {
+        placeInChat($('<div>').addClass('chat-event').text(text));
+    }
+
+    function handleEvent(event, data) {
+        switch (event) {
+            case 'typing':
+                $('#messages .typing-indicator').remove();
+                if (data) placeInChat($('<div class="typing-indicator">Monika is typing...</div>'));
+                break;
+            case 'token':
+                if (!live) {
+                    live = $('<div>').addClass('chat-message monika streaming').text('Monika: ');
+                    placeInChat(live);
+                }
+                live.text(live.text() + data.text);
+                break;
+            case 'message':
+                if (data.role === 'monika' && live) {
+                    live.remove();
+                    live = null;
+                }
+                appendMessage(data);
+                break;
+            case 'meal_logged':
+                appendNote(`Logged ${data.meal}: ${data.food} (${data.qty}g, ${Math.round(data.calories)} cal)`);
+                break;
+            case 'exercise_logged':
+                appendNote(`Logged ${data.amount} ${data.type.toLowerCase()} (${data.calories} cal)`);
+                break;
+            case 'tally':
+                console.log('Tally:', data);
+                break;
+            case 'error':
+                console.error('Stream error:', data.message);
+                appendNote(data.message);
+                break;
+            case 'done':
+                updateChat(data);
+                break;
         }
-        $('#messages').append(
-            `<div class="mood-bar"><div class="mood-progress" style="width: ${state.progress * 100}%;"></div></div>`
-        );
         $('#messages').scrollTop($('#messages')[0].scrollHeight);
     }
 
-    $('#messages').scrollTop($('#messages')[0].scrollHeight);
-});
+    function handleFrame(frame) {
+        var event = 'message', data = '';
+        frame.split('\n').forEach(function(line) {
+            if (line.indexOf('event:') === 0) event = line.slice(6).trim();
+            else if (line.indexOf('data:') === 0) data += line.slice(5).trim();
+        });
+        if (data) handleEvent(event, JSON.parse(data));
+    }
+
+    fetch('/send/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+        body: $.param(withCursor({ message: message })),
+        credentials: 'same-origin'
+    }).then(function(response) {
+        var reader = response.body.getReader();
+        var decoder = new TextDecoder();
+        var buffer = '';
+        function pump() {
+            return reader.read().then(function(result) {
+                if (result.done) {
+                    if (buffer.trim()) handleFrame(buffer);
+                    return;
+                }
+                buffer += decoder.decode(result.value, { stream: true });
+                var frames = buffer.split('\n\n');
+                buffer = frames.pop();
+                frames.forEach(handleFrame);
+                return pump();
+            });
+        }
+        return pump();
+    }).catch(function(err) {
+        console.error('Error:', err);
+    });
+}
 
 function toggleMode(mode) {
     console.log('Toggling mode to:', mode);
     $.ajax({
         url: '/toggle_mode',
         type: 'POST',
-        data: { mode: mode },
+        data: withCursor({ mode: mode }),
         dataType: 'json',
         success: function(data) {
             console.log('Toggle Response:', data);
-            updateChat(data.messages, data.state);
+            updateChat(data);
         },
         error: function(xhr) {
             console.error('Error:', xhr.responseText);
         }
     });
-}
\ No newline at end of file
+}
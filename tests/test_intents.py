@@ -0,0 +1,44 @@
+# The step-100 intent router over a corpus of real user messages; bench/bench_intents.py times the
+# same corpus against the old if/elif chain.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from intents import router
+
+# (message, expected intent, expected slots)
+CORPUS = [
+    ("What do I eat for lunch?", "plan_query", {"meal": "lunch"}),
+    ("what do i eat for dinner tonight babe", "plan_query", {"meal": "dinner"}),
+    ("I ate breakfast from the plan", "ate", {"meal": "breakfast", "plan": "plan"}),
+    ("i ate lunch like you suggested", "ate", {"meal": "lunch", "plan": "suggested"}),
+    ("i ate plan", "ate", {"meal": None, "plan": "plan"}),
+    ("I ate dinner", "ate", {"meal": "dinner", "plan": None}),
+    ("i ate", "ate", {"meal": None, "plan": None}),
+    ("Just did 12 laps!", "exercise", {"duration": "12", "unit": "laps"}),
+    ("walked 2.5 miles after work", "exercise", {"duration": "2.5", "unit": "miles"}),
+    ("30 minutes on the treadmill", "exercise", {"duration": "30", "unit": "minutes"}),
+    ("45min walk", "exercise", {"duration": "45", "unit": "min"}),
+    ("I fucked up and got a Bacanator", "slip", {}),
+    ("had a bacanator, sorry", "slip", {}),
+    ("I didn’t eat breakfast", "skip_meal", {"meal": "breakfast"}),
+    ("i didn't eat snack", "skip_meal", {"meal": "snack"}),
+    ("skip dinner", "skip_meal", {"meal": "dinner"}),
+    ("skipped lunch today", "skip_meal", {"meal": "lunch"}),
+    ("skip", "skip_meal", {"meal": None}),
+    # A lower-priority trigger doesn't hide a higher-priority one right after it
+    ("skip i ate lunch", "ate", {"meal": "lunch", "plan": None}),
+    ("skipped breakfast but i ate lunch from the plan", "ate", {"meal": "lunch", "plan": "plan"}),
+    ("bacanator 30 minutes ago", "exercise", {"duration": "30", "unit": "minutes"}),
+    ("hey Monika, how's it going?", "fallback", {}),
+    ("what's the plan for today", "fallback", {}),
+    ("I'm feeling great this morning, weighed in lighter than yesterday and ready to crush it", "fallback", {}),
+]
+
+
+@pytest.mark.parametrize("message,name,slots", CORPUS)
+def test_route(message, name, slots):
+    intent = router.route(message)
+    assert (intent.name, intent.slots) == (name, slots)
@@ -0,0 +1,285 @@
+import time
+import datetime
+import threading
+
+import numpy as np
+
+# Incremental reads: each refresh only fetches rows on or after a day already seen in each table
+SERIES_QUERIES = {
+    "weight": "SELECT [Date], RecordedWeight FROM WeightLog WHERE [Date] >= ? ORDER BY [Date]",
+    "intake": "SELECT [Date], TotalCalories FROM ActualMeals WHERE [Date] >= ? ORDER BY [Date]",
+    "burn": "SELECT [Date], CalorieBurn FROM Exercise WHERE [Date] >= ? ORDER BY [Date]",
+    "laps": "SELECT LogDate, Laps FROM ProgressLog WHERE LogDate >= ? ORDER BY LogDate",
+}
+GOAL_QUERY = "SELECT TOP 1 StartWeight, TargetWeight, TargetDate FROM Goals WHERE GoalType = 'LongTerm' AND Active = 1"
+FIRST_DAY = datetime.date(1900, 1, 1)
+# Days before the newest one seen that are read again on every refresh: the daily check logs
+# yesterday's meals and exercise
+REREAD_DAYS = 1
+
+
+def _day(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def _round(value, digits=1):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+# Per-day sums and counts for one series, as arrays indexed by days since the earliest row.
+# Rows are added in place, growing the arrays at either end as new days show up.
+class DailySeries:
+    def __init__(self):
+        self.origin = None
+        self.sums = np.zeros(0)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, ordinals, values):
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        if not len(ordinals):
+            return
+        first, last = int(ordinals.min()), int(ordinals.max())
+        if self.origin is None:
+            self.origin = first
+        if first < self.origin:
+            self.sums = np.concatenate((np.zeros(self.origin - first), self.sums))
+            self.counts = np.concatenate((np.zeros(self.origin - first, dtype=np.int64), self.counts))
+            self.origin = first
+        if last - self.origin + 1 > len(self.sums):
+            grow = last - self.origin + 1 - len(self.sums)
+            self.sums = np.concatenate((self.sums, np.zeros(grow)))
+            self.counts = np.concatenate((self.counts, np.zeros(grow, dtype=np.int64)))
+        np.add.at(self.sums, ordinals - self.origin, values)
+        np.add.at(self.counts, ordinals - self.origin, 1)
+
+    def clear_from(self, ordinal):
+        # Drops the days from ordinal on, before they're read again
+        if self.origin is not None and ordinal - self.origin < len(self.sums):
+            self.sums[max(ordinal - self.origin, 0):] = 0
+            self.counts[max(ordinal - self.origin, 0):] = 0
+
+    def window(self, first, last):
+        # Sums and counts for ordinals first..last, zero-filled where there's no data
+        sums = np.zeros(last - first + 1)
+        counts = np.zeros(last - first + 1, dtype=np.int64)
+        if self.origin is not None:
+            lo, hi = max(first, self.origin), min(last, self.origin + len(self.sums) - 1)
+            if lo <= hi:
+                sums[lo - first:hi - first + 1] = self.sums[lo - self.origin:hi - self.origin + 1]
+                counts[lo - first:hi - first + 1] = self.counts[lo - self.origin:hi - self.origin + 1]
+        return sums, counts
+
+
+def rolling_mean(sums, counts, days):
+    # Mean of the rows in each trailing window of days, NaN where the window has none
+    cum_sums = np.concatenate(([0.0], np.cumsum(sums)))
+    cum_counts = np.concatenate(([0], np.cumsum(counts)))
+    end = np.arange(1, len(sums) + 1)
+    start = np.maximum(end - days, 0)
+    window_sums = cum_sums[end] - cum_sums[start]
+    window_counts = cum_counts[end] - cum_counts[start]
+    return np.divide(window_sums, window_counts, out=np.full(len(sums), np.nan), where=window_counts > 0)
+
+
+# Weight and calorie trends from WeightLog, ActualMeals, Exercise and ProgressLog. refresh()
+# re-reads each table from the day before the newest one it has seen (on its own pooled
+# connection, like DailyTally) and folds the rows into per-day arrays, then recomputes the report
+# from those: 7-day average weight, a least-squares loss rate over the last fit_days, the
+# projected goal date against Goals.TargetDate, and calorie intake/burn per week. A background
+# thread refreshes when notify() is called by a write path and every max_age seconds; requests
+# only read self.report. A failed refresh is retried after a backoff rather than on every write.
+# Everything is reloaded every rebuild_interval, which picks up edits, deletes and backdated rows.
+class TrendEngine:
+    def __init__(self, pool, fit_days=28, history_days=60, weeks=4, max_age=60, rebuild_interval=3600):
+        self.pool = pool
+        self.fit_days = fit_days
+        self.history_days = history_days
+        self.weeks = weeks
+        self.max_age = max_age
+        self.rebuild_interval = rebuild_interval
+        self.report = None
+        self.version = 0
+        self._rebuilt_at = 0
+        self._mutex = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"refreshes": 0, "rebuilds": 0, "rows": 0, "failures": 0}
+        self._reset()
+
+    def _reset(self):
+        self.series = {name: DailySeries() for name in SERIES_QUERIES}
+        self.since = dict.fromkeys(SERIES_QUERIES, FIRST_DAY)
+        self.goal = None
+
+    def notify(self, rebuild=False):
+        if rebuild:
+            self._rebuilt_at = 0
+        self._wake.set()
+
+    def _load(self, cursor):
+        for name, query in SERIES_QUERIES.items():
+            since = self.since[name]
+            cursor.execute(query, (since,))
+            rows = [(_day(row[0]), row[1]) for row in cursor.fetchall() if row[0] is not None]
+            self.series[name].clear_from(since.toordinal())
+            if not rows:
+                continue
+            self.since[name] = max(row[0] for row in rows) - datetime.timedelta(days=REREAD_DAYS)
+            rows = [row for row in rows if row[1] is not None]
+            self.series[name].add([row[0].toordinal() for row in rows], [row[1] for row in rows])
+            self.stats["rows"] += len(rows)
+        cursor.execute(GOAL_QUERY)
+        self.goal = cursor.fetchone()
+
+    def refresh(self):
+        with self._mutex:
+            now = time.time()
+            if now - self._rebuilt_at >= self.rebuild_interval:
+                self._reset()
+                self._rebuilt_at = now
+                self.stats["rebuilds"] += 1
+            with self.pool.connection() as conn:
+                self._load(conn.cursor())
+            self.report = self.compute(datetime.date.today())
+            self.version += 1
+            self.stats["refreshes"] += 1
+            return self.report
+
+    def _run(self):
+        backoff = 0
+        while True:
+            if not backoff:
+                self._wake.wait(self.max_age)
+            self._wake.clear()
+            try:
+                self.refresh()
+                backoff = 0
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"TRENDS ERROR: refresh failed - {e}")
+                backoff = min(backoff * 2 or 1, self.max_age)
+                time.sleep(backoff)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trends", daemon=True)
+            self._thread.start()
+
+    def compute(self, today):
+        end = today.toordinal()
+        report = {"as_of": today.isoformat()}
+        report["weight"] = weight = self._weight(end)
+        report["goal"] = self._goal(today, weight)
+        report["calories"] = self._calories(end)
+        report["laps"] = self._laps(end)
+        return report
+
+    def _weight(self, end):
+        series = self.series["weight"]
+        if series.origin is None:
+            return {"current": None, "average_7d": None, "fitted": None, "rate_per_week": None, "points": []}
+        first = min(series.origin, end - self.history_days + 1)
+        sums, counts = series.window(first, end)
+        daily = np.divide(sums, counts, out=np.full(len(sums), np.nan), where=counts > 0)
+        average = rolling_mean(sums, counts, 7)
+        weighed = np.flatnonzero(counts)
+
+        # Loss rate: least-squares line through the daily weights in the fit window, x in days
+        # from today, so the intercept is today's fitted weight
+        recent = weighed[weighed >= len(sums) - self.fit_days]
+        slope = fitted = None
+        if len(recent) >= 2:
+            x = (recent - (len(sums) - 1)).astype(float)
+            slope, fitted = np.polyfit(x, daily[recent], 1)
+
+        shown = np.arange(max(len(sums) - self.history_days, 0), len(sums))
+        shown = shown[counts[shown] > 0]
+        return {
+            "current": _round(daily[weighed[-1]]) if len(weighed) else None,
+            "average_7d": _round(average[weighed[-1]]) if len(weighed) else None,
+            "fitted": _round(fitted),
+            "rate_per_week": _round(slope * 7 if slope is not None else None, 2),
+            "points": [[datetime.date.fromordinal(first + int(i)).isoformat(), _round(daily[i]), _round(average[i])]
+                       for i in shown],
+        }
+
+    def _goal(self, today, weight):
+        if not self.goal or self.goal[1] is None:
+            return None
+        start, target = float(self.goal[0] or 0), float(self.goal[1])
+        target_date = _day(self.goal[2]) if self.goal[2] else None
+        current = weight["fitted"] if weight["fitted"] is not None else weight["average_7d"]
+        goal = {"start": start, "target": target, "target_date": target_date.isoformat() if target_date else None,
+                "progress": None, "projected_date": None, "days_ahead": None, "on_track": None,
+                "required_rate_per_week": None}
+        if current is None:
+            return goal
+        if start and start != target:
+            goal["progress"] = round(float(np.clip((start - current) / (start - target), 0, 1)), 3)
+        remaining = current - target
+        rate = weight["rate_per_week"]
+        if remaining <= 0:
+            goal.update(projected_date=today.isoformat(), on_track=True)
+        elif rate is not None and rate < 0 and remaining / -rate * 7 < 3650:
+            projected = today + datetime.timedelta(days=int(np.ceil(remaining / -rate * 7)))
+            goal["projected_date"] = projected.isoformat()
+            if target_date:
+                goal["days_ahead"] = (target_date - projected).days
+                goal["on_track"] = projected <= target_date
+        elif target_date and rate is not None:
+            goal["on_track"] = False
+        if remaining > 0 and target_date and target_date > today:
+            goal["required_rate_per_week"] = round(-remaining / (target_date - today).days * 7, 2)
+        return goal
+
+    def _calories(self, end):
+        # Trailing 7-day blocks ending today, oldest first
+        first = end - self.weeks * 7 + 1
+        intake, meals = self.series["intake"].window(first, end)
+        burn, _ = self.series["burn"].window(first, end)
+        intake, burn, meals = intake.reshape(self.weeks, 7), burn.reshape(self.weeks, 7), meals.reshape(self.weeks, 7)
+        days_logged = (meals > 0).sum(axis=1)
+        weeks = []
+        for i in range(self.weeks):
+            week_start = datetime.date.fromordinal(first + i * 7)
+            weeks.append({"start": week_start.isoformat(), "intake": round(float(intake[i].sum())),
+                          "burn": round(float(burn[i].sum())), "net": round(float(intake[i].sum() - burn[i].sum())),
+                          "days_logged": int(days_logged[i])})
+        return {"weeks": weeks}
+
+    def _laps(self, end):
+        sums, _ = self.series["laps"].window(end - self.weeks * 7 + 1, end)
+        return {"per_week": [round(float(total), 1) for total in sums.reshape(self.weeks, 7).sum(axis=1)]}
+
+    def snapshot(self):
+        return dict(self.stats, version=self.version, since={k: v.isoformat() for k, v in self.since.items()})
+
+
+def with_baseline(report, baseline):
+    # Weekly balance against the baseline burn, over the days that have meals logged (negative
+    # is a deficit); an unlogged day would otherwise read as a full-baseline deficit
+    if report is None or not baseline:
+        return report
+    weeks = [dict(week, balance=week["net"] - baseline * week["days_logged"] if week["days_logged"] else None)
+             for week in report["calories"]["weeks"]]
+    return dict(report, calories=dict(report["calories"], baseline=baseline, weeks=weeks))
+
+
+def mood(report):
+    # Summary for the session state (sent with every message delta): the mood bar shows progress.
+    # Until there's a loss rate (fewer than two weigh-ins, e.g. right after Day 1) it stays neutral.
+    goal = (report or {}).get("goal") or {}
+    weight = (report or {}).get("weight") or {}
+    trending = weight.get("rate_per_week") is not None or goal.get("on_track") is not None
+    return {
+        "progress": goal.get("progress") if trending else None,
+        "trend_data": {"weight": weight.get("average_7d"), "rate_per_week": weight.get("rate_per_week"),
+                       "projected_date": goal.get("projected_date"), "on_track": goal.get("on_track")},
+        "happy": goal.get("on_track") is True,
+        "sad": goal.get("on_track") is False,
+    }
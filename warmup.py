@@ -0,0 +1,96 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+# Start-up work done off the import path. Each component (DB, LLM client, caches) has a warm-up
+# function that a background thread retries with backoff until it succeeds, so the process can
+# answer /healthz straight away and /readyz once every required component is up. Components with
+# a probe are re-checked every recheck_interval (or at once after recheck(), for a request that
+# hit an error); a failed probe puts the component back to warming up.
+class Warmup:
+    def __init__(self, recheck_interval=10, backoff=0.5, max_backoff=30):
+        self.recheck_interval = recheck_interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.started_at = time.time()
+        self._components = OrderedDict()
+        self._mutex = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, name, warm, probe=None, required=True):
+        self._components[name] = {
+            "warm": warm, "probe": probe, "required": required, "ready": False, "error": None,
+            "attempts": 0, "ready_at": None, "checked_at": 0.0,
+        }
+
+    def ready(self, name=None):
+        with self._mutex:
+            if name is not None:
+                return self._components[name]["ready"]
+            return all(c["ready"] for c in self._components.values() if c["required"])
+
+    def recheck(self, name):
+        # Probes a ready component now rather than at its next interval; one that's already down is
+        # left to its backoff, so a burst of failing requests doesn't hammer it
+        with self._mutex:
+            component = self._components[name]
+            if not component["ready"]:
+                return
+            component["checked_at"] = 0.0
+        self._wake.set()
+
+    def _attempt(self, name, component, fn):
+        try:
+            fn()
+        except Exception as e:
+            with self._mutex:
+                if component["error"] != str(e):
+                    print(f"WARMUP: {name} not ready - {e}")
+                component.update(ready=False, error=str(e), attempts=component["attempts"] + 1)
+            return False
+        with self._mutex:
+            if not component["ready"]:
+                component["ready_at"] = time.time()
+                print(f"WARMUP: {name} ready ({component['ready_at'] - self.started_at:.1f}s after start)")
+            component.update(ready=True, error=None, checked_at=time.time())
+        return True
+
+    def run_once(self):
+        # Components run in the order they were added, so later ones can depend on earlier ones
+        all_ready = True
+        for name, component in self._components.items():
+            if not component["ready"]:
+                all_ready = self._attempt(name, component, component["warm"]) and all_ready
+            elif component["probe"] is not None and time.time() - component["checked_at"] >= self.recheck_interval:
+                all_ready = self._attempt(name, component, component["probe"]) and all_ready
+        return all_ready
+
+    def _run(self):
+        delay = self.backoff
+        while True:
+            if self.run_once():
+                delay = self.backoff
+                self._wake.wait(self.recheck_interval)
+            else:
+                self._wake.wait(delay)
+                delay = min(delay * 2, self.max_backoff)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        with self._mutex:
+            components = {
+                name: {"ready": c["ready"], "required": c["required"], "error": c["error"], "attempts": c["attempts"]}
+                for name, c in self._components.items()
+            }
+        return {"ready": all(c["ready"] for c in components.values() if c["required"]),
+                "uptime": round(time.time() - self.started_at, 1), "components": components}
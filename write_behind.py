@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import datetime
+import threading
+from collections import deque
+
+# Statements for each journaled write. Exercise rows for an earlier day (a journal replayed after
+# midnight) can't go through SubmitExercise, which always logs today, so they're inserted directly,
+# with the type id that earlier rows of the same type were given.
+STATEMENTS = {
+    "exercise": "EXEC SubmitExercise @ExerciseType=?, @DurationMinutes=?, @CalorieBurn=?",
+    "exercise_on": ("INSERT INTO Exercise ([Date], ExerciseTypeID, ExerciseType, DurationMinutes, CalorieBurn) "
+                    "VALUES (?, (SELECT MAX(ExerciseTypeID) FROM Exercise WHERE ExerciseType = ? AND ExerciseTypeID IN "
+                    "(SELECT LookupID FROM LookupValues WHERE GroupName = 'ExerciseTypes')), ?, ?, ?)"),
+    "progress": "INSERT INTO ProgressLog (LogDate, Laps, CaloriesBurned, Weight) VALUES (?, ?, ?, ?)",
+    "meal": "EXEC LogActual @Date=?, @FoodID=?, @Description=?, @Quantity=?, @TotalCalories=?, @MealName=?",
+    "weight": "INSERT INTO WeightLog ([Date], RecordedWeight) VALUES (?, ?)",
+    "deviation": "EXEC LogDeviation @Date=?, @Reason=?",
+}
+
+
+# SubmitExercise's burn for exercise logged without one (walking): calories per minute
+WALKING_CALORIES_PER_MINUTE = 4
+
+
+def estimated_burn(entry):
+    # An exercise entry's burn, estimated as SubmitExercise would when it was logged without one
+    if entry["calories"] is not None:
+        return entry["calories"]
+    return int(round(float(entry["minutes"] or 0) * WALKING_CALORIES_PER_MINUTE))
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return float(value)
+
+
+# Write-behind journal for log writes (exercise, meals, weight, deviations). append() writes the entry to an
+# append-only JSONL file and fsyncs it before returning, so the caller can acknowledge the user
+# without waiting on the DB. A background thread applies pending entries in batches, one
+# transaction per batch (writes landing within flush_interval of each other share one), and
+# records the last applied sequence number in a checkpoint file. On startup, entries past the
+# checkpoint are replayed. Delivery is at-least-once: a crash between a commit and its checkpoint
+# write replays that batch. One process per journal file.
+class WriteBehindJournal:
+    def __init__(self, pool, path, batch_size=100, flush_interval=0.5, max_attempts=5, compact_bytes=1 << 20):
+        self.pool = pool
+        self.path = path
+        self.checkpoint_path = f"{path}.checkpoint"
+        self.failed_path = f"{path}.failed"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.compact_bytes = compact_bytes
+        self._pending = deque()
+        self._mutex = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Condition(self._mutex)
+        self._thread = None
+        self._attempts = 0
+        self._rejections = 0
+        self._suspect_seq = 0
+        self.stats = {"appended": 0, "flushed": 0, "batches": 0, "replayed": 0, "retries": 0, "failed": 0}
+        self.applied_seq = self._read_checkpoint()
+        self.seq = self.applied_seq
+        self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_checkpoint(self, seq):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append; it was never acknowledged
+                    continue
+                self.seq = max(self.seq, entry["seq"])
+                if entry["seq"] > self.applied_seq:
+                    self._pending.append(entry)
+        self.stats["replayed"] = len(self._pending)
+        if self._pending:
+            print(f"JOURNAL: replaying {len(self._pending)} pending writes from {self.path}")
+
+    def append(self, kind, **fields):
+        with self._mutex:
+            self.seq += 1
+            entry = {"seq": self.seq, "kind": kind, "at": time.time(),
+                     **json.loads(json.dumps(fields, default=_json_default))}
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending.append(entry)
+            self.stats["appended"] += 1
+        self._wake.set()
+        return entry
+
+    def pending(self, kind=None):
+        with self._mutex:
+            return [entry for entry in self._pending if kind is None or entry["kind"] == kind]
+
+    def frozen(self):
+        # Holds off the writer, so DB reads and pending() agree on which writes have been applied.
+        # Check out the connection for those reads before taking it (see flush_once).
+        return self._flush_lock
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _apply(self, cursor, entry):
+        kind = entry["kind"]
+        if kind == "exercise":
+            calories = entry["calories"]
+            if entry["date"] == datetime.date.today().isoformat():
+                # Walking is logged without a burn; SubmitExercise works it out, and ProgressLog
+                # gets the value it returns, as on the synchronous path
+                cursor.execute(STATEMENTS["exercise"], (entry["type"], entry["minutes"], calories))
+                row = cursor.fetchone()
+                cursor.fetchall()
+                if row is not None and row[1] is not None:
+                    calories = row[1]
+            else:
+                # No SubmitExercise to work out a walk's burn, so it gets the same estimate
+                calories = estimated_burn(entry)
+                cursor.execute(STATEMENTS["exercise_on"], (entry["date"], entry["type"], entry["type"], entry["minutes"],
+                                                           calories))
+            cursor.execute(STATEMENTS["progress"], (entry["date"], entry["laps"], calories, entry["weight"]))
+        elif kind == "meal":
+            cursor.execute(STATEMENTS["meal"], (entry["date"], entry["food_id"], entry["description"], entry["qty"],
+                                                entry["calories"], entry["meal"]))
+        elif kind == "weight":
+            cursor.execute(STATEMENTS["weight"], (entry["date"], entry["weight"]))
+        elif kind == "deviation":
+            cursor.execute(STATEMENTS["deviation"], (entry["date"], entry["reason"]))
+        else:
+            raise ValueError(f"unknown journal entry kind {kind!r}")
+
+    def flush_once(self):
+        # Only this thread removes entries, so the batch stays at the head of _pending while the
+        # connection is checked out
+        with self._mutex:
+            # After a failed batch, retry its entries one at a time so a single bad row can't
+            # hold back the rest
+            size = 1 if self._pending and self._pending[0]["seq"] <= self._suspect_seq else self.batch_size
+            batch = [self._pending[i] for i in range(min(size, len(self._pending)))]
+        if not batch:
+            return 0
+        rejected = committed = False
+        try:
+            # Connection first, then _flush_lock: the same order as a request reading under frozen(),
+            # so with the pool exhausted neither side holds what the other is waiting for
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                with self._flush_lock:
+                    try:
+                        for entry in batch:
+                            rejected = True
+                            self._apply(cursor, entry)
+                            rejected = False
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    committed = True
+                    self._done(batch[-1]["seq"], len(batch))
+        except Exception as e:
+            if committed:
+                raise
+            self._attempts += 1
+            self._suspect_seq = max(self._suspect_seq, batch[-1]["seq"])
+            self.stats["retries"] += 1
+            print(f"JOURNAL ERROR: flush of {len(batch)} writes failed (attempt {self._attempts}) - {e}")
+            # Only a statement the DB keeps rejecting is set aside; an outage just retries
+            self._rejections = self._rejections + 1 if rejected and len(batch) == 1 else 0
+            if self._rejections >= self.max_attempts:
+                self._give_up(batch[0], e)
+                return 1
+            raise
+        self._attempts = 0
+        return len(batch)
+
+    def _give_up(self, entry, error):
+        with open(self.failed_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(entry, error=str(error))) + "\n")
+        print(f"JOURNAL ERROR: giving up on write {entry['seq']}, moved to {self.failed_path}")
+        self.stats["failed"] += 1
+        self._attempts = self._rejections = 0
+        self._done(entry["seq"], 1, applied=False)
+
+    def _done(self, seq, count, applied=True):
+        self._write_checkpoint(seq)
+        with self._mutex:
+            for _ in range(count):
+                self._pending.popleft()
+            self.applied_seq = seq
+            if applied:
+                self.stats["flushed"] += count
+                self.stats["batches"] += 1
+            if not self._pending:
+                if self._file.tell() > self.compact_bytes:
+                    self._file.truncate(0)
+                    self._file.seek(0)
+                self._idle.notify_all()
+
+    def flush(self, timeout=None):
+        # Wakes the writer and waits until everything appended so far has been applied
+        self._wake.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._mutex:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining if remaining is not None else 1)
+        return True
+
+    def _run(self):
+        backoff = None
+        while True:
+            self._wake.wait(backoff)
+            self._wake.clear()
+            if backoff is None and len(self._pending) < self.batch_size:
+                # Give writes arriving close together a moment to land in the same batch
+                time.sleep(self.flush_interval)
+            try:
+                while self.flush_once():
+                    pass
+                backoff = None
+            except Exception:
+                backoff = min(max((backoff or 0) * 2, 0.5), 30)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def snapshot(self):
+        return dict(self.stats, pending=len(self._pending), applied_seq=self.applied_seq, seq=self.seq)